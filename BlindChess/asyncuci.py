@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+"""
+    asyncio driver for UCI engines.
+    The engine's stdout is read with the StreamReader's buffered readline(),
+    output up to a tag is collected as a list of lines and joined once,
+    and there are no threads to leak.
+
+    async with AsyncUCITalker(config) as uci:
+        await uci.setup()
+        move = await uci.getMove("go movetime 1000")
+
+        async for rec in uci.search("go infinite"):
+            if isinstance(rec, BestMove):
+                break
+            if rec.depth and rec.depth >= 20:
+                await uci.stop()    # keep iterating until the BestMove
+"""
+import asyncio
+import logging
+from ucinfo import parseLine, BestMove
+
+class AsyncEngineRunner:
+    def __init__(self, config, timeout=None):
+        self.eng = None
+        self.config = config
+        self.engineCmd = self.config["engineCmd"]
+        self.engineArgs = self.config.get("engineArgs", [])
+        self.timeout = timeout
+        self.header = None
+
+    async def start(self):
+        logging.info("Starting engine")
+        self.eng = await asyncio.create_subprocess_exec(self.engineCmd, *self.engineArgs, stdin=asyncio.subprocess.PIPE,
+                                                        stdout=asyncio.subprocess.PIPE)
+
+    async def readLines(self, tag=None, timeout=None):
+        """ Lines up to and including the first one starting with tag (or just one line) """
+        return await asyncio.wait_for(self._readLines(tag), timeout or self.timeout)
+
+    async def _readLines(self, tag):
+        lines = []
+        while True:
+            line = await self.eng.stdout.readline()
+            if not line:
+                raise EOFError("Engine closed its output")
+            line = line.decode()
+            lines.append(line)
+            if tag is None or line.startswith(tag):
+                return lines
+
+    async def read(self, tag=None, timeout=None):
+        return "".join(await self.readLines(tag, timeout))
+
+    async def send(self, cmd):
+        logging.debug("Sending cmd: %s", cmd)
+        self.eng.stdin.write(("%s\n" % cmd).encode())
+        await self.eng.stdin.drain()
+
+    async def getOutput(self, cmd, stopTag, timeout=None):
+        await self.send(cmd)
+        return await self.read(stopTag, timeout)
+
+    async def close(self, timeout=5):
+        if self.eng is None or self.eng.returncode is not None:
+            return
+        logging.info("Stopping engine")
+        try:
+            await self.send("quit")
+            await asyncio.wait_for(self.eng.wait(), timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            self.eng.kill()
+            await self.eng.wait()
+
+    async def __aenter__(self):
+        await self.start()
+        self.header = await self.read()
+        logging.info("Header: %s" % self.header)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+def parseBoard(out):
+    """ Splits the output of the `d` command into (board lines, fen, checkers) """
+    board, fen, checkers = [], None, ""
+    for line in out.splitlines():
+        if line.startswith(" +") or line.startswith(" |"):
+            board.append(line)
+        elif line.startswith("Fen: "):
+            fen = line[5:]
+        elif line.startswith("Checkers:"):
+            checkers = line[10:]
+    return board, fen, checkers
+
+class AsyncUCITalker(AsyncEngineRunner):
+    def __init__(self, config, timeout=None):
+        super().__init__(config, timeout)
+        self.moveTime = 1000
+        self.moves = []
+        self.board = None
+        self.fen = None
+        self.chk = None
+
+    async def setup(self):
+        await self.getOutput("uci", "uciok")
+        await self.send("setoption name Skill Level value %i" % self.config["Skill Level"])
+        await self.newGame()
+
+    async def isReady(self, timeout=None):
+        await self.getOutput("isready", "readyok", timeout)
+
+    async def newGame(self):
+        await self.send("ucinewgame")
+        await self.isReady()
+
+    async def position(self, fen=None, moves=()):
+        cmd = "position startpos" if fen is None else "position fen %s" % fen
+        if moves:
+            cmd += " moves %s" % " ".join(moves)
+        await self.send(cmd)
+
+    async def getBoard(self):
+        self.board, self.fen, self.chk = parseBoard(await self.getOutput("d", "Checkers"))
+        return self.fen
+
+    async def eval(self):
+        return await self.getOutput("eval", "Total Eval")
+
+    async def getMove(self, cmd, timeout=None):
+        await self.send(cmd)
+        lines = await self.readLines("bestmove", timeout)
+        try:
+            move = lines[-1].split()[1]
+        except IndexError:
+            logging.error("getMove error")
+            return
+        return move if move != "(none)" else None
+
+    async def search(self, cmd, timeout=None):
+        """ Yields InfoRecords as the engine prints them, ends with the BestMove """
+        await self.send(cmd)
+        while True:
+            line = await asyncio.wait_for(self.eng.stdout.readline(), timeout or self.timeout)
+            if not line:
+                raise EOFError("Engine closed its output")
+            rec = parseLine(line.decode())
+            if rec is not None:
+                yield rec
+                if isinstance(rec, BestMove):
+                    return
+
+    async def stop(self):
+        await self.send("stop")
+
+    async def searchUntil(self, cmd, good=None, timeout=None):
+        """
+            Runs a search, stopping it as soon as good(info) is True.
+            Returns (BestMove, last InfoRecord)
+        """
+        info = None
+        stopped = False
+        async for rec in self.search(cmd, timeout):
+            if isinstance(rec, BestMove):
+                return rec, info
+            info = rec
+            if good is not None and not stopped and good(rec):
+                await self.stop()
+                stopped = True
+
+    async def getCpuMove(self):
+        return await self.getMove("go movetime %i" % self.moveTime)
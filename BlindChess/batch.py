@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+"""
+    Headless batch analysis.
+    Streams positions from puzzle.json, an EPD file or a file with one FEN
+    per line through an EnginePool and writes one JSON line per position as
+    soon as it is analysed. Only a bounded number of positions is in flight,
+    so memory stays flat on big inputs.
+
+    ./batch.py puzzle.json --depth 12
+    ./batch.py positions.epd --movetime 200 -n 8 -o results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+from board import Board
+from enginepool import EnginePool
+
+def readPositions(filename):
+    """ Yields (id, fen) """
+    if filename.endswith(".json"):
+        with open(filename) as f:
+            for pid, puzzle in json.load(f).items():
+                yield pid, puzzle["fen"]
+        return
+
+    with open(filename) as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            if len(parts) >= 6 and parts[4].isdigit() and parts[5].isdigit():
+                yield str(n), " ".join(parts[:6])
+            else:
+                # EPD: 4 FEN fields followed by operations, use the id operation if there is one
+                pid = str(n)
+                for op in " ".join(parts[4:]).split(";"):
+                    op = op.strip()
+                    if op.startswith("id "):
+                        pid = op[3:].strip().strip('"')
+                yield pid, " ".join(parts[:4]) + " 0 1"
+
+def resultRecord(pid, fen, result, elapsed):
+    info = result.info
+    return {
+        "id": pid,
+        "fen": fen,
+        "bestmove": result.bestmove,
+        "ponder": result.ponder,
+        "score": info.score if info else None,
+        "mate": info.mate if info else None,
+        "pv": list(info.pv) if info and info.pv else [],
+        "depth": info.depth if info else None,
+        "nodes": info.nodes if info else None,
+        "time": info.time if info else None,
+        "elapsed": round(elapsed, 4),
+    }
+
+def isValidRank(rank):
+    squares = 0
+    for c in rank:
+        if c in "12345678":
+            squares += int(c)
+        elif c in "pnbrqkPNBRQK":
+            squares += 1
+        else:
+            return False
+    return squares == 8
+
+def isValidPosition(fen):
+    """
+        Well-formed FEN fields, one king each, no pawn on a back rank and the
+        side not to move isn't in check. Engines may crash otherwise.
+    """
+    parts = fen.split()
+    if len(parts) < 4:
+        return False
+    placement, turn, castling, ep = parts[:4]
+    ranks = placement.split("/")
+    if len(ranks) != 8 or not all(isValidRank(r) for r in ranks):
+        return False
+    if placement.count("K") != 1 or placement.count("k") != 1:
+        return False
+    if any(c in "Pp" for c in ranks[0] + ranks[7]):
+        return False
+    if turn not in ("w", "b"):
+        return False
+    if castling != "-" and re.fullmatch(r"K?Q?k?q?", castling) is None:
+        return False
+    if ep != "-" and re.fullmatch(r"[a-h]6" if turn == "w" else r"[a-h]3", ep) is None:
+        return False
+    if not all(p.isdigit() for p in parts[4:6]):
+        return False
+    board = Board(fen)
+    return not board.isAttacked(board.kings["b" if turn == "w" else "w"], turn)
+
+async def analyseOne(pool, pid, fen, limits):
+    if not isValidPosition(fen):
+        return {"id": pid, "fen": fen, "error": "invalid FEN"}
+    start = time.perf_counter()
+    try:
+        result = await pool.analyse(fen, **limits)
+    except Exception as e:
+        logging.error("Analysis of %s failed: %r", pid, e)
+        return {"id": pid, "fen": fen, "error": repr(e)}
+    return resultRecord(pid, fen, result, time.perf_counter() - start)
+
+async def runBatch(config, positions, limits, out, engines, inflight=None):
+    inflight = inflight or 2 * engines
+    count = 0
+
+    def write(tasks):
+        nonlocal count
+        for task in tasks:
+            out.write(json.dumps(task.result()) + "\n")
+            count += 1
+        out.flush()
+
+    async with EnginePool(config, size=engines) as pool:
+        pending = set()
+        for pid, fen in positions:
+            if len(pending) >= inflight:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                write(done)
+            pending.add(asyncio.ensure_future(analyseOne(pool, pid, fen, limits)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            write(done)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch position analysis")
+    parser.add_argument("input", help="puzzle.json, .epd or a file with one FEN per line")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--output", "-o", default="-", help="JSON Lines output, - for stdout")
+    parser.add_argument("--engines", "-n", type=int, default=None, help="engine processes (default: cores)")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument("--depth", type=int)
+    limit.add_argument("--movetime", type=int, help="ms")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    with open(args.config) as f:
+        config = json.load(f)
+    limits = {"depth": args.depth} if args.depth else {"movetime": args.movetime or 1000}
+    engines = args.engines or os.cpu_count()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    start = time.perf_counter()
+    try:
+        count = asyncio.run(runBatch(config, readPositions(args.input), limits, out, engines))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print("%i positions in %.2fs, %.1f positions/s" % (count, elapsed, count / elapsed if elapsed else 0),
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
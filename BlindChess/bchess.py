@@ -12,6 +12,11 @@ import time
 from queue import Queue
 import json
 import re
+from cache import ResultCache, normalizeFen
+from board import Board, startFen, moveToUci
+from ucinfo import parseLine, BestMove
+from gamedb import GameDB
+from tracing import EngineTracer
 
 class EngineRunner:
     def __init__(self, config):
@@ -19,11 +24,13 @@ class EngineRunner:
         self.buf = Queue()
         self.config = config
         self.engineCmd = self.config["engineCmd"]
+        self.engineArgs = self.config.get("engineArgs", [])
+        self.tracer = EngineTracer(**self.config["trace"]) if "trace" in self.config else None
 
     def start(self):
         logging.info("Starting engine")
         try:
-            self.eng = sp.Popen([self.engineCmd], bufsize=0, stdout=sp.PIPE, stdin=sp.PIPE, universal_newlines=True)
+            self.eng = sp.Popen([self.engineCmd] + self.engineArgs, bufsize=0, stdout=sp.PIPE, stdin=sp.PIPE, universal_newlines=True)
         except sp.SubprocessError as e:
             logging.error("%s" % e.msg)
             return
@@ -35,13 +42,19 @@ class EngineRunner:
         self.th.start()
 
     def read(self, tag=None):
-        logging.info("Reading output")
-        out = ""
+        logging.debug("Reading output")
+        return "".join(self.readIter(tag))
+
+    def readIter(self, tag=None):
+        """ Yields lines as they arrive, up to and including the one starting with tag """
         while True:
             line = self.buf.get()
-            out += line
-            if tag is None or line.startswith(tag):
-                return out
+            last = tag is None or line.startswith(tag)
+            if self.tracer is not None:
+                self.tracer.line(line, self.buf.qsize(), last)
+            yield line
+            if last:
+                return
 
     def readerThread(self):
         while True:
@@ -52,8 +65,13 @@ class EngineRunner:
                 break
 
     def send(self, cmd):
-        logging.info("Sending cmd: %s", cmd)
+        logging.debug("Sending cmd: %s", cmd)
+        if self.tracer is None:
+            self.eng.stdin.write("%s\n" % cmd)
+            return
+        start = time.perf_counter()
         self.eng.stdin.write("%s\n" % cmd)
+        self.tracer.sent(cmd, start, time.perf_counter())
 
     def __enter__(self):
         self.start()
@@ -63,17 +81,25 @@ class EngineRunner:
     def __exit__(self, exc_type, exc_value, traceback):
         logging.info("Stopping engine")
         self.send("quit")
-        #self.readerThread.isAlive()
-        #self.eng.poll()
+        self.eng.wait()
+        self.th.join()
+        if self.tracer is not None:
+            self.tracer.close()
+            logging.info("Engine I/O:\n%s", self.tracer.report())
 
 class UCITalker(EngineRunner):
     def __init__(self, config):
         super().__init__(config)
         self.moveTime = 1000
         self.moves = []
+        self.sans = []
+        self.lastInfo = None
+        self.game = Board()
+        self.startFen = startFen
+        self.fen = startFen
 
     def setup(self):
-        self.send("uci")
+        self.getOutput("uci", "uciok")
         self.send("setoption name Skill Level value %i" % self.config["Skill Level"])
         self.send("ucinewgame")
         #self.send("position fen %s" % self.puzzle[0])
@@ -93,59 +119,148 @@ class UCITalker(EngineRunner):
         self.send(cmd)
         return self.read(stopTag)
 
-    def getMove(self, cmd):
-        out = self.getOutput(cmd, stopTag="bestmove").splitlines()
-        move = ""
-        try:
-            move = out[-1].split()[1]
-        except IndexError:
+    def getMove(self, cmd, onInfo=None):
+        """
+            Runs a search and returns the best move. Parsed info lines are
+            passed to onInfo(record) as they arrive, if it returns True the
+            search is stopped and the engine's move so far is used.
+        """
+        if onInfo is None:
+            lines = self.getOutput(cmd, stopTag="bestmove").splitlines()
+        else:
+            self.send(cmd)
+            lines = self.readIter("bestmove")
+
+        best = None
+        stopped = False
+        for line in lines:
+            rec = parseLine(line)
+            if isinstance(rec, BestMove):
+                best = rec
+            elif rec is not None:
+                self.lastInfo = rec
+                if onInfo is not None and not stopped and onInfo(rec):
+                    self.send("stop")
+                    stopped = True
+
+        if self.tracer is not None:
+            self.tracer.search(self.lastInfo)
+
+        if best is None:
             logging.error("getMove error")
             return
-        
-        logging.info("getMove: %s" % move)
 
-        if move != "(none)":
-            return move
-        return None
+        logging.info("getMove: %s" % best.move)
+        return best.move
 
     def checkMove(self, move):
-        cmd = "go searchmoves %s" % move
-        return self.getMove(cmd)
+        """ Move in UCI notation if legal (promotion defaults to queen), else None. No engine involved. """
+        m = self.game.parseMove(move)
+        return None if m is None else moveToUci(m)
+
+    def newGame(self, fen=startFen, moves=()):
+        """ Starts from fen, or resumes a game after the given (legal) moves """
+        self.game = Board(fen)
+        self.startFen = fen
+        self.moves = []
+        self.sans = []
+        for move in moves:
+            self.sans.append(self.game.san(move))
+            self.game.push(move)
+            self.moves.append(move)
+        self.fen = self.game.fen()
+        self.send("ucinewgame\n%s" % self.gamePosition())
+
+    def gamePosition(self):
+        cmd = "position fen %s" % self.startFen
+        if self.moves:
+            cmd += " moves %s" % " ".join(self.moves)
+        return cmd
+
+    def playMove(self, move):
+        self.sans.append(self.game.san(move))
+        self.game.push(move)
+        self.moves.append(move)
+        self.fen = self.game.fen()
+        self.send(self.gamePosition())
+
+    def result(self):
+        if self.game.isCheckmate():
+            return "Checkmate"
+        if self.game.isStalemate():
+            return "Stalemate"
+        return None
 
     def getUserMove(self, move):
-        if not self.checkMove(move):
+        move = self.checkMove(move)
+        if not move:
             return
-        self.moves.append(move)
-        self.send("position fen %s moves %s" % (self.fen, move))
+        self.playMove(move)
         return move
 
     def getCpuMove(self):
         move = self.getMove("go movetime %i" % self.moveTime)
         if not move:
             return
-        self.moves.append(move)
-        self.send("position fen %s moves %s" % (self.fen, move))
+        if self.checkMove(move) is None:
+            logging.error("Engine move %s is illegal in %s" % (move, self.game.fen()))
+            return
+        self.playMove(move)
         return move
 
-    def long2pgn(self, move):
-        """ 
-            It isn't a real pgn, only start loc is translatated 
-            to piece name.
-            TODO: 
-            Distinction when two pieces in the same row/col
-            castling/checks/captures
-        """
-        start = move[:2]
-        stop = move[2:]
+class CachedUCITalker(UCITalker):
+    """
+        UCITalker with board dumps, eval output and search results cached.
+        `d` output is keyed by the last position command sent, eval/go by
+        the normalized FEN of that position, all within one engine/skill
+        scope. Commands are only cached while the position is known.
+    """
+    def __init__(self, config, cache=None):
+        super().__init__(config)
+        self.cache = cache or ResultCache()
+        self.scope = "%s|%s" % (self.engineCmd, self.config["Skill Level"])
+        self.positionCmd = None
+        self.fenFor = None
 
-        col = 4*(ord(start[0]) - ord('a')) + 3
-        row = 2*(9 - int(start[1])) - 1
+    def send(self, cmd):
+        for line in cmd.splitlines():
+            if line.startswith("position"):
+                self.positionCmd = line
+            elif line == "ucinewgame":
+                self.positionCmd = None
+        super().send(cmd)
 
-        c = self.board[row][col].upper()
-        if c == "P":
-            c = ""
+    def getBoard(self):
+        super().getBoard()
+        self.fenFor = self.positionCmd
 
-        return " %s%s " % (c, stop)
+    def cacheKey(self, cmd):
+        if self.positionCmd is None:
+            return None
+        if cmd == "d":
+            return (self.scope, cmd, self.positionCmd)
+        if cmd == "eval" or cmd.startswith("go"):
+            if self.positionCmd == self.gamePosition():
+                return (self.scope, cmd, normalizeFen(self.game.fen()))
+            if self.fenFor != self.positionCmd:
+                self.getBoard()
+            return (self.scope, cmd, normalizeFen(self.fen))
+        return None
+
+    def getOutput(self, cmd, stopTag):
+        key = self.cacheKey(cmd)
+        if key is None:
+            return super().getOutput(cmd, stopTag)
+        out = self.cache.get(key)
+        if out is None:
+            out = super().getOutput(cmd, stopTag)
+            self.cache.put(key, out)
+        return out
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        logging.info("Cache hits: %i, misses: %i", self.cache.hits, self.cache.misses)
+        self.cache.close()
 
 class GameLoop:
     def __init__(self):
@@ -154,6 +269,7 @@ class GameLoop:
         self.puzzle = None
         self.configFile = "config.json"
         self.puzzleFile = "puzzle.json"
+        self.gameDb = None
 
     def loadConfigs(self):
         try:
@@ -173,8 +289,6 @@ class GameLoop:
         return True
 
     def parseCommand(self, cmd, uci):
-        uci.getBoard()
-
         if cmd == "d":
             uci.getBoard()
             print("\n".join(uci.board))
@@ -185,20 +299,33 @@ class GameLoop:
         elif cmd == "quit":
             return False
         elif cmd.startswith("load"):
-            print("Not implemented yet")
+            args = cmd.split()
+            game = self.gameDb.game(int(args[1])) if len(args) == 2 and args[1].isdigit() else None
+            if game is None:
+                print("Usage: load <game id>")
+                return True
+            uci.newGame(game.fen, game.moves)
+            print(" ".join(uci.sans))
+            print(uci.result() or "%s to move" % ("White" if uci.game.turn == "w" else "Black"))
+            self.curgame = True
         elif cmd.startswith("save"):
-            print("Not implemented yet")
+            if not self.curgame:
+                print("No game to save")
+                return True
+            print("Saved as game %i" % self.gameDb.addGame(uci.moves, uci.startFen, uci.result()))
+        elif cmd == "find":
+            games = self.gameDb.gamesThrough(uci.game.fen())
+            print("%i games: %s" % (len(games), " ".join(map(str, games))))
         elif cmd.startswith("new"):
             color = "w"
             if len(cmd) > 3:
                 color = cmd.split()[1]
-            uci.send("ucinewgame\nposition startpos")
+            uci.newGame()
             if color.lower().startswith("b"):
-                uci.getBoard()
                 cpumove = uci.getCpuMove()
-                print("\t%s (%s)" %  (cpumove, uci.long2pgn(cpumove)))
+                print("\t%s (%s)" %  (cpumove, uci.sans[-1]))
             self.curgame = True
-        elif 4 <= len(cmd) <= 5 and re.fullmatch(r"[a-h]\d[a-h]\d\w?", cmd) is not None:
+        elif 4 <= len(cmd) <= 5 and re.fullmatch(r"[a-h][1-8][a-h][1-8][qrbn]?", cmd) is not None:
             if not self.curgame:
                 print("Use new or load first")
                 return True
@@ -209,35 +336,44 @@ class GameLoop:
                 print("Invalid move")
                 return True
 
-            uci.getBoard()
-            
+            if uci.result() is not None:
+                print(uci.result())
+                return True
+
             cpumove = uci.getCpuMove()
             if cpumove is None:
                 print("Mate")
                 uci.send("stop")
                 return True
             else:
-                print("\t%s (%s)" %  (cpumove, uci.long2pgn(cpumove)))
+                print("\t%s (%s)" %  (cpumove, uci.sans[-1]))
+                if uci.result() is not None:
+                    print(uci.result())
         else:
             uci.send(cmd)
             print(uci.read())
 
         return True
 
+    def createTalker(self):
+        """ "cache": {"maxsize": ..., "dbPath": ...} in config.json enables the result cache """
+        if "cache" in self.config:
+            return CachedUCITalker(self.config, ResultCache(**self.config["cache"]))
+        return UCITalker(self.config)
+
     def parseCmds(self):
         if not self.loadConfigs():
             logging.error("Could not load config files")
             return
 
-        with UCITalker(self.config) as uci:
+        with GameDB(self.config.get("gameDb", "games.db")) as self.gameDb, self.createTalker() as uci:
             uci.setup()
-            uci.getBoard()
 
             running = True
             while running:
                 running = self.parseCommand(input("> "), uci)
 
-            print(uci.moves)
+            print(" ".join(uci.sans))
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+"""
+    Engine driver latency benchmark.
+    Runs UCITalker (thread + queue) and AsyncUCITalker against the mock
+    engine and reports per-command latency percentiles, throughput and the
+    driver's own CPU time per command, so I/O path regressions show up
+    without a real engine.
+
+    ./bench.py --count 2000 --info-lines 1000 -o before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from bchess import UCITalker
+from asyncuci import AsyncUCITalker
+
+def engineConfig(args):
+    mock = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mockengine.py")
+    config = {
+        "engineCmd": sys.executable,
+        "engineArgs": [mock, "--cmd-delay", str(args.cmd_delay), "--info-lines", str(args.info_lines)],
+        "Skill Level": 0,
+    }
+    if args.trace is not None:
+        config["trace"] = {"path": args.trace or None}
+    return config
+
+def summary(name, samples, wall, cpu, linesPerCmd=1):
+    q = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    return {
+        "name": name,
+        "count": len(samples),
+        "meanMs": statistics.mean(samples) * 1e3,
+        "p50Ms": q[49] * 1e3,
+        "p90Ms": q[89] * 1e3,
+        "p99Ms": q[98] * 1e3,
+        "cmdsPerSec": len(samples) / wall,
+        "linesPerSec": len(samples) * linesPerCmd / wall,
+        "cpuMsPerCmd": cpu / len(samples) * 1e3,
+    }
+
+def measure(name, fn, count, linesPerCmd=1):
+    samples = []
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return summary(name, samples, time.perf_counter() - start, time.process_time() - cpu, linesPerCmd)
+
+async def ameasure(name, fn, count, linesPerCmd=1):
+    samples = []
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - t)
+    return summary(name, samples, time.perf_counter() - start, time.process_time() - cpu, linesPerCmd)
+
+def benchSync(args):
+    results = []
+    with UCITalker(engineConfig(args)) as uci:
+        uci.setup()
+        goCount = max(1, args.count // 20)
+        results.append(measure("isready", lambda: uci.getOutput("isready", "readyok"), args.count))
+        results.append(measure("d", uci.getBoard, args.count))
+        results.append(measure("eval", lambda: uci.getOutput("eval", "Total Eval"), args.count))
+        results.append(measure("go", lambda: uci.getMove("go"), goCount, args.info_lines + 1))
+    if uci.tracer is not None:
+        print(uci.tracer.report())
+    return results
+
+async def benchAsync(args):
+    results = []
+    async with AsyncUCITalker(engineConfig(args), timeout=60) as uci:
+        await uci.setup()
+        goCount = max(1, args.count // 20)
+        results.append(await ameasure("isready", uci.isReady, args.count))
+        results.append(await ameasure("d", uci.getBoard, args.count))
+        results.append(await ameasure("eval", uci.eval, args.count))
+        results.append(await ameasure("go", lambda: uci.getMove("go"), goCount, args.info_lines + 1))
+    return results
+
+def printTable(driver, results):
+    print("%-6s %-8s %7s %8s %8s %8s %8s %10s %11s %9s" % ("driver", "command", "count", "mean ms", "p50 ms",
+          "p90 ms", "p99 ms", "cmds/s", "lines/s", "cpu ms"))
+    for r in results:
+        print("%-6s %-8s %7i %8.3f %8.3f %8.3f %8.3f %10.1f %11.1f %9.4f" % (driver, r["name"], r["count"],
+              r["meanMs"], r["p50Ms"], r["p90Ms"], r["p99Ms"], r["cmdsPerSec"], r["linesPerSec"], r["cpuMsPerCmd"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="UCI driver benchmark against the mock engine")
+    parser.add_argument("--driver", choices=("sync", "async", "both"), default="both")
+    parser.add_argument("--count", type=int, default=1000, help="commands per measurement")
+    parser.add_argument("--info-lines", type=int, default=500, help="info lines per go")
+    parser.add_argument("--cmd-delay", type=float, default=0, help="mock engine delay per command, ms")
+    parser.add_argument("--trace", nargs="?", const="", help="trace the sync driver, optionally to a JSONL file")
+    parser.add_argument("--output", "-o", help="write the results as JSON")
+    args = parser.parse_args()
+
+    report = {"args": vars(args), "python": sys.version.split()[0], "results": {}}
+    if args.driver in ("sync", "both"):
+        report["results"]["sync"] = benchSync(args)
+        printTable("sync", report["results"]["sync"])
+    if args.driver in ("async", "both"):
+        report["results"]["async"] = asyncio.run(benchAsync(args))
+        printTable("async", report["results"]["async"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/python3
+"""
+    In-process chess board on a 0x88 array.
+    Legal move generation, FEN in/out, check/mate/stalemate detection and
+    SAN, so move validation doesn't need the engine.
+    Squares are 16*rank + file (a1 = 0, h8 = 119), pieces are FEN letters,
+    moves are (from, to, promotion) tuples or UCI strings (e2e4, e7e8q).
+"""
+import random
+
+startFen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+knightDirs = (33, 31, 18, 14, -33, -31, -18, -14)
+bishopDirs = (17, 15, -17, -15)
+rookDirs = (16, 1, -16, -1)
+kingDirs = bishopDirs + rookDirs
+slideDirs = {"B": bishopDirs, "R": rookDirs, "Q": kingDirs}
+stepDirs = {"N": knightDirs, "K": kingDirs}
+# castling right lost when a piece moves from or to these squares
+castlingSquares = {0: "Q", 4: "KQ", 7: "K", 112: "q", 116: "kq", 119: "k"}
+
+def zobristTables(seed=0x88):
+    """ 63-bit keys so hashes fit in an SQLite INTEGER """
+    rng = random.Random(seed)
+    pieces = {p: [rng.getrandbits(63) for _ in range(128)] for p in "PNBRQKpnbrqk"}
+    castling = {c: rng.getrandbits(63) for c in "KQkq"}
+    epFile = [rng.getrandbits(63) for _ in range(8)]
+    return pieces, castling, epFile, rng.getrandbits(63)
+
+zobristPieces, zobristCastling, zobristEp, zobristBlack = zobristTables()
+
+def squareName(sq):
+    return "abcdefgh"[sq & 7] + str((sq >> 4) + 1)
+
+def parseSquare(name):
+    return (int(name[1]) - 1) * 16 + "abcdefgh".index(name[0])
+
+def moveToUci(move):
+    f, t, promo = move
+    return squareName(f) + squareName(t) + (promo or "")
+
+class Board:
+    def __init__(self, fen=startFen):
+        self.history = []
+        self.setFen(fen)
+
+    def setFen(self, fen):
+        parts = fen.split()
+        self.squares = [None] * 128
+        self.kings = {}
+        for i, row in enumerate(parts[0].split("/")):
+            sq = (7 - i) * 16
+            for c in row:
+                if c.isdigit():
+                    sq += int(c)
+                    continue
+                self.squares[sq] = c
+                if c in "Kk":
+                    self.kings["w" if c == "K" else "b"] = sq
+                sq += 1
+        self.turn = parts[1]
+        self.castling = "" if parts[2] == "-" else parts[2]
+        self.ep = None if parts[3] == "-" else parseSquare(parts[3])
+        self.halfmove = int(parts[4]) if len(parts) > 4 else 0
+        self.fullmove = int(parts[5]) if len(parts) > 5 else 1
+        self.history = []
+
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for sq in range(rank * 16, rank * 16 + 8):
+                p = self.squares[sq]
+                if p is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += p
+            rows.append(row + (str(empty) if empty else ""))
+        return "%s %s %s %s %i %i" % ("/".join(rows), self.turn, self.castling or "-",
+                                      "-" if self.ep is None else squareName(self.ep),
+                                      self.halfmove, self.fullmove)
+
+    def zobrist(self):
+        """
+            Hash of placement, side to move, castling and en passant. The en
+            passant square only counts if it can be captured, so FENs that
+            always list it and FENs that don't hash the same.
+        """
+        h = zobristBlack if self.turn == "b" else 0
+        sqs = self.squares
+        for sq in range(120):
+            p = sqs[sq]
+            if p is not None:
+                h ^= zobristPieces[p][sq]
+        for c in self.castling:
+            h ^= zobristCastling[c]
+        if self.ep is not None:
+            pawn, back = ("P", -16) if self.turn == "w" else ("p", 16)
+            for s in (self.ep + back - 1, self.ep + back + 1):
+                if not s & 0x88 and sqs[s] == pawn:
+                    h ^= zobristEp[self.ep & 7]
+                    break
+        return h
+
+    def isOwn(self, p, side):
+        return p is not None and p.isupper() == (side == "w")
+
+    def isAttacked(self, sq, side):
+        """ Is sq attacked by `side` """
+        sqs = self.squares
+        white = side == "w"
+        pawn, knight, king = ("P", "N", "K") if white else ("p", "n", "k")
+        for d in ((-15, -17) if white else (15, 17)):
+            s = sq + d
+            if not s & 0x88 and sqs[s] == pawn:
+                return True
+        for d in knightDirs:
+            s = sq + d
+            if not s & 0x88 and sqs[s] == knight:
+                return True
+        for d in kingDirs:
+            s = sq + d
+            if not s & 0x88 and sqs[s] == king:
+                return True
+        for dirs, attackers in ((bishopDirs, "BQ"), (rookDirs, "RQ")):
+            if not white:
+                attackers = attackers.lower()
+            for d in dirs:
+                s = sq + d
+                while not s & 0x88:
+                    p = sqs[s]
+                    if p is not None:
+                        if p in attackers:
+                            return True
+                        break
+                    s += d
+        return False
+
+    def inCheck(self):
+        return self.isAttacked(self.kings[self.turn], "b" if self.turn == "w" else "w")
+
+    def pieceMoves(self, sq):
+        """ Pseudo-legal moves of the piece on sq """
+        sqs = self.squares
+        p = sqs[sq]
+        side = self.turn
+        if not self.isOwn(p, side):
+            return []
+        enemy = "b" if side == "w" else "w"
+        kind = p.upper()
+        moves = []
+        if kind == "P":
+            fwd = 16 if side == "w" else -16
+            startRank, lastRank = (1, 7) if side == "w" else (6, 0)
+            targets = []
+            t = sq + fwd
+            if not t & 0x88 and sqs[t] is None:
+                targets.append(t)
+                if sq >> 4 == startRank and sqs[t + fwd] is None:
+                    targets.append(t + fwd)
+            for d in (fwd - 1, fwd + 1):
+                t = sq + d
+                if not t & 0x88 and (self.isOwn(sqs[t], enemy) or t == self.ep):
+                    targets.append(t)
+            for t in targets:
+                if t >> 4 == lastRank:
+                    moves.extend((sq, t, promo) for promo in "qrbn")
+                else:
+                    moves.append((sq, t, None))
+        elif kind in stepDirs:
+            for d in stepDirs[kind]:
+                t = sq + d
+                if not t & 0x88 and not self.isOwn(sqs[t], side):
+                    moves.append((sq, t, None))
+            if kind == "K":
+                moves.extend(self.castlingMoves(sq, side, enemy))
+        else:
+            for d in slideDirs[kind]:
+                t = sq + d
+                while not t & 0x88:
+                    if sqs[t] is not None:
+                        if self.isOwn(sqs[t], enemy):
+                            moves.append((sq, t, None))
+                        break
+                    moves.append((sq, t, None))
+                    t += d
+        return moves
+
+    def castlingMoves(self, sq, side, enemy):
+        home = 4 if side == "w" else 116
+        if sq != home or self.isAttacked(sq, enemy):
+            return []
+        sqs = self.squares
+        rook = "R" if side == "w" else "r"
+        kingSide, queenSide = ("K", "Q") if side == "w" else ("k", "q")
+        moves = []
+        if kingSide in self.castling and sqs[sq + 3] == rook and sqs[sq + 1] is None and sqs[sq + 2] is None \
+                and not self.isAttacked(sq + 1, enemy) and not self.isAttacked(sq + 2, enemy):
+            moves.append((sq, sq + 2, None))
+        if queenSide in self.castling and sqs[sq - 4] == rook and sqs[sq - 1] is None and sqs[sq - 2] is None \
+                and sqs[sq - 3] is None and not self.isAttacked(sq - 1, enemy) and not self.isAttacked(sq - 2, enemy):
+            moves.append((sq, sq - 2, None))
+        return moves
+
+    def pseudoMoves(self):
+        moves = []
+        for sq in range(128):
+            if not sq & 0x88 and self.isOwn(self.squares[sq], self.turn):
+                moves.extend(self.pieceMoves(sq))
+        return moves
+
+    def isSafe(self, move):
+        """ Doesn't leave own king in check """
+        side = self.turn
+        self.push(move)
+        safe = not self.isAttacked(self.kings[side], self.turn)
+        self.pop()
+        return safe
+
+    def legalMoves(self):
+        return [m for m in self.pseudoMoves() if self.isSafe(m)]
+
+    def parseMove(self, uci):
+        """ Legal move tuple for a UCI string or None. A promotion without a piece promotes to a queen. """
+        try:
+            f, t = parseSquare(uci[0:2]), parseSquare(uci[2:4])
+            if not all(0 <= sq < 128 and not sq & 0x88 for sq in (f, t)):
+                return None
+        except (ValueError, IndexError):
+            return None
+        promo = uci[4:5].lower() or None
+        p = self.squares[f]
+        if promo is None and p in ("P", "p") and t >> 4 in (0, 7):
+            promo = "q"
+        move = (f, t, promo)
+        if move not in self.pieceMoves(f) or not self.isSafe(move):
+            return None
+        return move
+
+    def isLegal(self, uci):
+        return self.parseMove(uci) is not None
+
+    def push(self, move):
+        if isinstance(move, str):
+            move = self.parseMove(move)
+            if move is None:
+                raise ValueError("Illegal move")
+        f, t, promo = move
+        sqs = self.squares
+        self.history.append((list(sqs), self.turn, self.castling, self.ep, self.halfmove,
+                             self.fullmove, dict(self.kings)))
+        p = sqs[f]
+        kind = p.upper()
+        white = self.turn == "w"
+
+        self.halfmove = 0 if kind == "P" or sqs[t] is not None else self.halfmove + 1
+        if kind == "P" and t == self.ep:
+            sqs[t - 16 if white else t + 16] = None
+        sqs[t] = (promo.upper() if white else promo) if promo else p
+        sqs[f] = None
+        if kind == "K":
+            self.kings[self.turn] = t
+            if t - f == 2:
+                sqs[f + 1], sqs[f + 3] = sqs[f + 3], None
+            elif f - t == 2:
+                sqs[f - 1], sqs[f - 4] = sqs[f - 4], None
+        for sq in (f, t):
+            for right in castlingSquares.get(sq, ""):
+                self.castling = self.castling.replace(right, "")
+        self.ep = (f + t) // 2 if kind == "P" and abs(t - f) == 32 else None
+        if not white:
+            self.fullmove += 1
+        self.turn = "b" if white else "w"
+        return move
+
+    def pop(self):
+        self.squares, self.turn, self.castling, self.ep, self.halfmove, self.fullmove, self.kings = self.history.pop()
+
+    def isCheckmate(self):
+        return self.inCheck() and not self.legalMoves()
+
+    def isStalemate(self):
+        return not self.inCheck() and not self.legalMoves()
+
+    def san(self, move):
+        """ SAN of a legal move in the current position """
+        if isinstance(move, str):
+            move = self.parseMove(move)
+        f, t, promo = move
+        p = self.squares[f]
+        kind = p.upper()
+        if kind == "K" and abs(t - f) == 2:
+            san = "O-O" if t > f else "O-O-O"
+        else:
+            capture = self.squares[t] is not None or (kind == "P" and t == self.ep)
+            if kind == "P":
+                san = squareName(f)[0] + "x" if capture else ""
+            else:
+                san = kind
+                rivals = [m[0] for m in self.legalMoves()
+                          if m[1] == t and m[0] != f and self.squares[m[0]] == p]
+                if rivals:
+                    if all(r & 7 != f & 7 for r in rivals):
+                        san += squareName(f)[0]
+                    elif all(r >> 4 != f >> 4 for r in rivals):
+                        san += squareName(f)[1]
+                    else:
+                        san += squareName(f)
+                if capture:
+                    san += "x"
+            san += squareName(t)
+            if promo:
+                san += "=" + promo.upper()
+        self.push(move)
+        if self.inCheck():
+            san += "#" if not self.legalMoves() else "+"
+        self.pop()
+        return san
+
+    def __str__(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            rows.append("%i %s" % (rank + 1, " ".join(self.squares[rank * 16 + f] or "." for f in range(8))))
+        rows.append("  a b c d e f g h")
+        return "\n".join(rows)
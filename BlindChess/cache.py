@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+"""
+    LRU result cache with optional SQLite persistence.
+    Keys are tuples of strings, values strings. With a db file, misses fall
+    through to SQLite and everything put is written there too.
+"""
+import sqlite3
+from collections import OrderedDict
+
+def normalizeFen(fen):
+    """ Placement, side to move, castling, en passant - move counters don't change the analysis """
+    return " ".join(fen.split()[:4])
+
+class ResultCache:
+    def __init__(self, maxsize=10000, dbPath=None, commitEvery=100):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        self.commitEvery = commitEvery
+        self.pending = 0
+        if dbPath is not None:
+            self.db = sqlite3.connect(dbPath)
+            self.db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT)")
+
+    @staticmethod
+    def makeKey(key):
+        return "\x1f".join(key)
+
+    def get(self, key):
+        key = self.makeKey(key)
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.db is not None:
+            row = self.db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.remember(key, row[0])
+                self.hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        key = self.makeKey(key)
+        self.remember(key, value)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?)", (key, value))
+            self.pending += 1
+            if self.pending >= self.commitEvery:
+                self.commit()
+
+    def remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def commit(self):
+        if self.db is not None:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        if self.db is not None:
+            self.commit()
+            self.db.close()
+            self.db = None
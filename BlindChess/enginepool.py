@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+"""
+    Pool of UCI engine processes for analysing many independent positions.
+    Every engine is set up from the same config.json, jobs (FEN + go limits)
+    go to whichever engine is idle. Engines that die or stop answering are
+    restarted and the job is retried once.
+
+    async with EnginePool(config, size=4) as pool:
+        results = await pool.analyseMany([(fen, {"movetime": 1000}), ...])
+"""
+import asyncio
+import logging
+import os
+from collections import namedtuple
+from asyncuci import AsyncUCITalker
+from ucinfo import BestMove
+
+AnalysisResult = namedtuple("AnalysisResult", "fen limits bestmove ponder info")
+AnalysisResult.__doc__ = "info is the last main line InfoRecord of the search (score, pv, nodes...)"
+
+engineErrors = (asyncio.TimeoutError, EOFError, ConnectionError)
+
+def goCommand(limits):
+    return " ".join(["go"] + ["%s %s" % (k, v) for k, v in limits.items()])
+
+class EnginePool:
+    def __init__(self, config, size=None, timeout=30, resetEachJob=True):
+        self.config = config
+        self.size = size or os.cpu_count()
+        self.timeout = timeout
+        self.resetEachJob = resetEachJob
+        self.engines = []
+        self.idle = asyncio.Queue()
+
+    async def spawn(self):
+        uci = AsyncUCITalker(self.config, timeout=self.timeout)
+        await uci.__aenter__()
+        await uci.setup()
+        return uci
+
+    async def start(self):
+        self.engines = list(await asyncio.gather(*(self.spawn() for _ in range(self.size))))
+        for uci in self.engines:
+            self.idle.put_nowait(uci)
+
+    async def restart(self, uci):
+        logging.warning("Restarting engine (pid %s)", uci.eng.pid if uci.eng else None)
+        try:
+            await uci.close(timeout=1)
+        except ProcessLookupError:
+            pass
+        new = await self.spawn()
+        self.engines[self.engines.index(uci)] = new
+        return new
+
+    async def isAlive(self, uci, timeout=5):
+        if uci.eng is None or uci.eng.returncode is not None:
+            return False
+        try:
+            await uci.isReady(timeout)
+        except engineErrors:
+            return False
+        return True
+
+    async def healthCheck(self, timeout=5):
+        """ Pings every idle engine, restarts the ones that don't answer """
+        checked = []
+        while not self.idle.empty():
+            checked.append(self.idle.get_nowait())
+        for i, uci in enumerate(checked):
+            if not await self.isAlive(uci, timeout):
+                checked[i] = await self.restart(uci)
+        for uci in checked:
+            self.idle.put_nowait(uci)
+
+    async def runJob(self, uci, fen, limits):
+        if self.resetEachJob:
+            await uci.newGame()
+        await uci.position(fen)
+        timeout = self.timeout
+        if "movetime" in limits:
+            timeout = max(timeout, 2 * int(limits["movetime"]) / 1000)
+        info = None
+        async for rec in uci.search(goCommand(limits), timeout):
+            if isinstance(rec, BestMove):
+                return AnalysisResult(fen, limits, rec.move, rec.ponder, info)
+            if rec.pv and (rec.multipv or 1) == 1:
+                info = rec
+
+    async def analyse(self, fen, **limits):
+        uci = await self.idle.get()
+        try:
+            try:
+                return await self.runJob(uci, fen, limits)
+            except engineErrors as e:
+                logging.error("Engine failed on %s: %r", fen, e)
+                uci = await self.restart(uci)
+                return await self.runJob(uci, fen, limits)
+        finally:
+            self.idle.put_nowait(uci)
+
+    async def analyseMany(self, jobs):
+        """ jobs: iterable of (fen, limits dict), results in the same order """
+        return await asyncio.gather(*(self.analyse(fen, **limits) for fen, limits in jobs))
+
+    async def close(self):
+        await asyncio.gather(*(uci.close() for uci in self.engines), return_exceptions=True)
+        self.engines = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+"""
+    Game store for played games.
+    Games are appended to an SQLite file with moves packed two bytes each
+    (from, to, promotion), and every position reached is indexed by its
+    Zobrist hash, so "which games went through this FEN" and "resume game N"
+    are single index lookups without replaying or parsing anything.
+
+    ./gamedb.py games.db show 12
+    ./gamedb.py games.db find "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+"""
+import argparse
+import sqlite3
+import struct
+import time
+from collections import namedtuple
+from board import Board, startFen, parseSquare, squareName
+
+StoredGame = namedtuple("StoredGame", "id fen moves result played")
+StoredGame.__doc__ = "moves are UCI strings, played is a unix timestamp"
+
+promotions = ("", "q", "r", "b", "n")
+
+def encodeMove(uci):
+    f, t = parseSquare(uci[0:2]), parseSquare(uci[2:4])
+    return (f >> 4) << 3 | f & 7 | ((t >> 4) << 3 | t & 7) << 6 | promotions.index(uci[4:5]) << 12
+
+def decodeMove(code):
+    f, t = code & 63, code >> 6 & 63
+    return squareName((f >> 3) << 4 | f & 7) + squareName((t >> 3) << 4 | t & 7) + promotions[code >> 12]
+
+def encodeMoves(moves):
+    return struct.pack("<%iH" % len(moves), *(encodeMove(m) for m in moves))
+
+def decodeMoves(data):
+    return [decodeMove(c) for c in struct.unpack("<%iH" % (len(data) // 2), data)]
+
+class GameDB:
+    def __init__(self, path="games.db"):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS games (id INTEGER PRIMARY KEY, fen TEXT, moves BLOB, "
+                        "result TEXT, played INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS positions (hash INTEGER, game INTEGER, ply INTEGER, "
+                        "PRIMARY KEY (hash, game, ply)) WITHOUT ROWID")
+
+    def insert(self, moves, fen, result):
+        """ moves must be legal, they are replayed without validation to hash the positions """
+        cur = self.db.execute("INSERT INTO games (fen, moves, result, played) VALUES (?, ?, ?, ?)",
+                              (None if fen == startFen else fen, encodeMoves(moves), result, int(time.time())))
+        gid = cur.lastrowid
+        board = Board(fen)
+        hashes = [(board.zobrist(), gid, 0)]
+        for ply, move in enumerate(moves, 1):
+            board.push((parseSquare(move[0:2]), parseSquare(move[2:4]), move[4:5] or None))
+            hashes.append((board.zobrist(), gid, ply))
+        self.db.executemany("INSERT OR IGNORE INTO positions VALUES (?, ?, ?)", hashes)
+        return gid
+
+    def addGame(self, moves, fen=startFen, result=None):
+        with self.db:
+            return self.insert(moves, fen, result)
+
+    def addGames(self, games):
+        """ games: iterable of (moves, fen, result), all in one transaction """
+        with self.db:
+            return [self.insert(moves, fen, result) for moves, fen, result in games]
+
+    def game(self, gid):
+        row = self.db.execute("SELECT id, fen, moves, result, played FROM games WHERE id = ?", (gid,)).fetchone()
+        if row is None:
+            return None
+        return StoredGame(row[0], row[1] or startFen, decodeMoves(row[2]), row[3], row[4])
+
+    def find(self, fen):
+        """ (game id, ply) of every time the position was reached """
+        return self.db.execute("SELECT game, ply FROM positions WHERE hash = ? ORDER BY game, ply",
+                               (Board(fen).zobrist(),)).fetchall()
+
+    def gamesThrough(self, fen):
+        return sorted({gid for gid, _ in self.find(fen)})
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Game store queries")
+    parser.add_argument("db")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("show").add_argument("id", type=int)
+    sub.add_parser("find").add_argument("fen")
+    sub.add_parser("count")
+    args = parser.parse_args()
+
+    with GameDB(args.db) as db:
+        if args.cmd == "show":
+            game = db.game(args.id)
+            if game is None:
+                print("No game %i" % args.id)
+                return
+            print("Game %i, %s, %s" % (game.id, time.strftime("%Y-%m-%d %H:%M", time.localtime(game.played)),
+                                       game.result or "unfinished"))
+            print(game.fen)
+            print(" ".join(game.moves))
+        elif args.cmd == "find":
+            start = time.perf_counter()
+            hits = db.find(args.fen)
+            for gid, ply in hits:
+                print("game %i ply %i" % (gid, ply))
+            print("%i hits in %.3f ms" % (len(hits), (time.perf_counter() - start) * 1e3))
+        else:
+            print(db.count())
+
+if __name__ == '__main__':
+    main()
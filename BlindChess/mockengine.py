@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+"""
+    Scriptable stand-in UCI engine for tests and benchmarks.
+    Answers uci, isready, ucinewgame, position, go, stop, d, eval and quit.
+    Positions are tracked with the local board, so moves are legal: the
+    "best" move is the first legal move. Output format of d/eval follows
+    Stockfish 8.
+
+    ./mockengine.py --go-delay 5 --info-lines 200 --line-delay 0.1
+"""
+import argparse
+import sys
+import threading
+import time
+from board import Board, startFen, moveToUci
+
+class MockEngine:
+    def __init__(self, args):
+        self.args = args
+        self.board = Board()
+        self.out = sys.stdout
+        self.lock = threading.Lock()
+        self.search = None
+        self.stopEvent = threading.Event()
+
+    def write(self, text):
+        with self.lock:
+            self.out.write(text + "\n")
+            self.out.flush()
+
+    def sleep(self, ms):
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def position(self, tokens):
+        if tokens[1] == "startpos":
+            fen, rest = startFen, tokens[2:]
+        else:
+            end = tokens.index("moves") if "moves" in tokens else len(tokens)
+            fen, rest = " ".join(tokens[2:end]), tokens[end:]
+        self.board = Board(fen)
+        for move in rest[1:]:
+            self.board.push(move)
+
+    def go(self, tokens):
+        self.stopJoin()
+        self.stopEvent.clear()
+        limits = dict(zip(tokens[1::2], tokens[2::2]))
+        infinite = "infinite" in tokens
+        depth = int(limits.get("depth", self.args.info_lines))
+        deadline = time.perf_counter() + int(limits["movetime"]) / 1000 if "movetime" in limits else None
+        searchmoves = tokens[tokens.index("searchmoves") + 1:] if "searchmoves" in tokens else []
+        self.search = threading.Thread(target=self.searchThread, args=(depth, infinite, deadline, searchmoves))
+        self.search.start()
+
+    def searchThread(self, depth, infinite, deadline, searchmoves):
+        moves = self.board.legalMoves()
+        if searchmoves:
+            moves = [m for m in moves if moveToUci(m) in searchmoves]
+        pv = " ".join(moveToUci(m) for m in moves[:self.args.pv_length])
+        self.sleep(self.args.go_delay)
+        d = 0
+        while not self.stopEvent.is_set():
+            if not infinite and d >= depth:
+                break
+            d += 1
+            if moves:
+                self.write("info depth %i seldepth %i multipv 1 score cp %i nodes %i nps 1000000 time %i pv %s"
+                           % (d, d, 10 + d, 1000 * d, d, pv))
+            self.sleep(self.args.line_delay)
+            if infinite and self.args.line_delay <= 0:
+                self.stopEvent.wait(0.001)
+        if deadline is not None:
+            self.stopEvent.wait(max(0, deadline - time.perf_counter()))
+        if moves:
+            self.write("bestmove %s" % moveToUci(moves[0]))
+        else:
+            self.write("bestmove (none)")
+
+    def stopJoin(self):
+        if self.search is not None:
+            self.stopEvent.set()
+            self.search.join()
+            self.search = None
+
+    def display(self):
+        sep = " +---+---+---+---+---+---+---+---+"
+        lines = ["", sep]
+        for rank in range(7, -1, -1):
+            lines.append(" | " + " | ".join(self.board.squares[rank * 16 + f] or " " for f in range(8)) + " |")
+            lines.append(sep)
+        checkers = ""
+        if self.board.inCheck():
+            checkers = "check"
+        lines += ["", "Fen: %s" % self.board.fen(), "Key: 0000000000000000", "Checkers: %s" % checkers]
+        self.write("\n".join(lines))
+
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        cmd = tokens[0]
+        self.sleep(self.args.cmd_delay)
+        if cmd == "uci":
+            self.write("id name MockEngine\nid author roznosci\n"
+                       "option name Skill Level type spin default 20 min 0 max 20\nuciok")
+        elif cmd == "isready":
+            self.write("readyok")
+        elif cmd == "ucinewgame":
+            self.board = Board()
+        elif cmd == "position":
+            self.position(tokens)
+        elif cmd == "go":
+            self.go(tokens)
+        elif cmd == "stop":
+            self.stopJoin()
+        elif cmd == "d":
+            self.display()
+        elif cmd == "eval":
+            self.write("Total Evaluation: 0.10 (white side)")
+        elif cmd == "quit":
+            return False
+        elif cmd != "setoption":
+            self.write("Unknown command: %s" % line.strip())
+        return True
+
+    def run(self):
+        self.write("MockEngine 1.0 by roznosci")
+        for line in sys.stdin:
+            if not self.handle(line):
+                break
+        self.stopJoin()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock UCI engine")
+    parser.add_argument("--cmd-delay", type=float, default=0, help="ms before handling any command")
+    parser.add_argument("--go-delay", type=float, default=0, help="ms before the first info line")
+    parser.add_argument("--line-delay", type=float, default=0, help="ms between info lines")
+    parser.add_argument("--info-lines", type=int, default=10, help="info lines per go without depth")
+    parser.add_argument("--pv-length", type=int, default=10)
+    MockEngine(parser.parse_args()).run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+"""
+    Engine I/O instrumentation.
+    EngineTracer times every command sent to the engine: the write itself,
+    the first line back and the terminating line, plus lines/bytes read,
+    the reader queue backlog and the nodes/nps the engine reported. Times
+    go into per-command histograms and, with a path, one JSON line per
+    command. Enabled with "trace": {"path": "trace.jsonl"} (or {}) in
+    config.json, off otherwise.
+"""
+import json
+import math
+import time
+
+class Histogram:
+    """ Microsecond samples in quarter-octave buckets (bucket i ends at 2 ** (i / 4)) """
+    def __init__(self):
+        self.buckets = [0] * 160
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, us):
+        self.buckets[min(math.ceil(4 * math.log2(max(us, 1))), 159)] += 1
+        self.count += 1
+        self.total += us
+        self.max = max(self.max, us)
+
+    def percentile(self, p):
+        """ Upper bound of the bucket holding the p-th percentile """
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(2 ** (i / 4), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+class EngineTracer:
+    phases = ("sendUs", "firstUs", "doneUs")
+
+    def __init__(self, path=None):
+        self.out = open(path, "a") if path else None
+        self.histograms = {}
+        self.cmd = None
+
+    def sent(self, cmd, start, end):
+        if cmd == "stop" and self.cmd is not None and self.cmd["doneUs"] is None:
+            self.cmd["stopUs"] = (start - self.cmd["start"]) * 1e6
+            return
+        self.finish()
+        self.cmd = {"cmd": cmd, "at": time.time(), "start": start, "sendUs": (end - start) * 1e6,
+                    "firstUs": None, "doneUs": None, "lines": 0, "bytes": 0, "queue": 0}
+
+    def line(self, line, queued, last):
+        c = self.cmd
+        if c is None:
+            return
+        us = (time.perf_counter() - c["start"]) * 1e6
+        if c["firstUs"] is None:
+            c["firstUs"] = us
+        if last:
+            c["doneUs"] = us
+        c["lines"] += 1
+        c["bytes"] += len(line)
+        c["queue"] = max(c["queue"], queued)
+
+    def search(self, info):
+        if self.cmd is not None and info is not None:
+            self.cmd.update(nodes=info.nodes, nps=info.nps, depth=info.depth)
+
+    def finish(self):
+        c = self.cmd
+        if c is None:
+            return
+        self.cmd = None
+        name = c["cmd"].split()[0] if c["cmd"].strip() else ""
+        for phase in self.phases:
+            if c[phase] is not None:
+                self.histograms.setdefault((name, phase), Histogram()).add(c[phase])
+        if self.out is not None:
+            del c["start"]
+            self.out.write(json.dumps(c) + "\n")
+
+    def report(self):
+        lines = ["%-12s %-8s %7s %10s %10s %10s %10s" % ("command", "phase", "count", "mean us", "p50 us",
+                                                         "p99 us", "max us")]
+        for (name, phase), h in sorted(self.histograms.items()):
+            lines.append("%-12s %-8s %7i %10.0f %10.0f %10.0f %10.0f" % (name, phase[:-2], h.count, h.mean(),
+                         h.percentile(50), h.percentile(99), h.max))
+        return "\n".join(lines)
+
+    def close(self):
+        self.finish()
+        if self.out is not None:
+            self.out.close()
+            self.out = None
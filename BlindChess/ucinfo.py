@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""
+    Parser for UCI engine search output.
+    parseLine() turns an `info ...` line into an InfoRecord and a
+    `bestmove ...` line into a BestMove, anything else into None.
+"""
+from collections import namedtuple
+
+infoFields = ("depth", "seldepth", "multipv", "score", "mate", "bound", "nodes", "nps", "time",
+              "hashfull", "tbhits", "cpuload", "currmove", "currmovenumber", "pv", "string")
+
+InfoRecord = namedtuple("InfoRecord", infoFields, defaults=(None,) * len(infoFields))
+InfoRecord.__doc__ = "One info line, score is in centipawns, mate in moves, pv is a tuple of UCI moves"
+
+BestMove = namedtuple("BestMove", "move ponder")
+
+intKeys = {"depth", "seldepth", "multipv", "nodes", "nps", "time", "hashfull", "tbhits", "cpuload",
+           "currmovenumber"}
+listKeys = {"pv", "refutation", "currline"}
+keywords = intKeys | listKeys | {"score", "currmove", "string", "sbhits"}
+
+def parseInfo(tokens):
+    fields = {}
+    i = 1
+    while i < len(tokens):
+        key = tokens[i]
+        i += 1
+        if key in intKeys and i < len(tokens):
+            fields[key] = int(tokens[i])
+            i += 1
+        elif key == "score":
+            while i + 1 < len(tokens) and tokens[i] in ("cp", "mate"):
+                fields["score" if tokens[i] == "cp" else "mate"] = int(tokens[i+1])
+                i += 2
+            if i < len(tokens) and tokens[i] in ("lowerbound", "upperbound"):
+                fields["bound"] = tokens[i]
+                i += 1
+        elif key == "currmove" and i < len(tokens):
+            fields["currmove"] = tokens[i]
+            i += 1
+        elif key == "string":
+            fields["string"] = " ".join(tokens[i:])
+            break
+        elif key in listKeys:
+            start = i
+            while i < len(tokens) and tokens[i] not in keywords:
+                i += 1
+            if key == "pv":
+                fields["pv"] = tuple(tokens[start:i])
+    return InfoRecord(**fields)
+
+def parseLine(line):
+    tokens = line.split()
+    if not tokens:
+        return None
+    if tokens[0] == "info":
+        try:
+            return parseInfo(tokens)
+        except ValueError:
+            return None
+    if tokens[0] == "bestmove":
+        move = tokens[1] if len(tokens) > 1 and tokens[1] != "(none)" else None
+        ponder = tokens[3] if len(tokens) > 3 and tokens[2] == "ponder" else None
+        return BestMove(move, ponder)
+    return None
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+"""
+    Reproducible GA benchmark.
+    Runs every combination of the grid with a fixed seed, each case in a
+    fresh process, and writes a JSON report. Two reports can be compared
+    with --compare.
+
+    ./bench.py -o before.json
+    ./bench.py -o after.json
+    ./bench.py --compare before.json after.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import platform
+import random
+import resource
+import sys
+import time
+from ga import Organism, PhaseTimer, createPopulation
+
+defaultGrid = {
+    "populationSize": [200, 1000],
+    "targetLen": [26, 200],
+    "mutationRate": [0.01, 0.05],
+    "selection": ["roulette", "tournament"],
+    "backend": ["python", "numpy"],
+}
+
+def makeTarget(length, seed):
+    # own RNG stream, otherwise the first random organism would equal the target
+    return "".join(random.Random("target%i" % seed).choices(Organism.availableGens, k=length))
+
+def runCase(case):
+    cfg = dict(case)
+    cfg["targetOrg"] = makeTarget(cfg.pop("targetLen"), case["seed"])
+    maxGenerations = cfg.pop("maxGenerations")
+    timeLimit = cfg.pop("timeLimit")
+
+    pop = createPopulation(cfg, seed=cfg["seed"])
+    pop.timer = PhaseTimer()
+    start = time.perf_counter()
+    for stats in pop.run(maxGenerations=maxGenerations, timeLimit=timeLimit):
+        pass
+    elapsed = time.perf_counter() - start
+    converged = stats.maxFitness >= pop.targetFitness
+
+    return {
+        "case": case,
+        "generations": stats.generation,
+        "maxFitness": stats.maxFitness,
+        "converged": converged,
+        "elapsed": elapsed,
+        "timeToConvergence": elapsed if converged else None,
+        "generationsPerSec": stats.generation / elapsed if elapsed else None,
+        # ru_maxrss is in kB on Linux
+        "peakRssKb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "phases": dict(pop.timer.totals),
+    }
+
+def cases(grid, seed, maxGenerations, timeLimit):
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        case = dict(zip(keys, values))
+        case.update(seed=seed, maxGenerations=maxGenerations, timeLimit=timeLimit)
+        yield case
+
+def caseKey(case):
+    return json.dumps(case, sort_keys=True)
+
+def environment(label):
+    env = {
+        "label": label,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        import numpy
+        env["numpy"] = numpy.__version__
+    except ImportError:
+        pass
+    return env
+
+def bench(args):
+    grid = dict(defaultGrid)
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+
+    results = []
+    # one process per case so peak memory and warm caches don't leak between cases
+    with mp.Pool(1, maxtasksperchild=1) as pool:
+        for result in pool.imap(runCase, cases(grid, args.seed, args.max_generations, args.time_limit)):
+            print("%-80s %8.1f gen/s %s" % (caseKey(result["case"]), result["generationsPerSec"] or 0,
+                                           "converged" if result["converged"] else ""), file=sys.stderr)
+            results.append(result)
+
+    report = {"environment": environment(args.label), "grid": grid, "results": results}
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+def compare(before, after):
+    with open(before) as f:
+        old = {caseKey(r["case"]): r for r in json.load(f)["results"]}
+    with open(after) as f:
+        new = {caseKey(r["case"]): r for r in json.load(f)["results"]}
+
+    print("%-80s %10s %10s %7s" % ("case", "before", "after", "ratio"))
+    for key in old:
+        if key not in new or not old[key]["generationsPerSec"] or not new[key]["generationsPerSec"]:
+            continue
+        a, b = old[key]["generationsPerSec"], new[key]["generationsPerSec"]
+        print("%-80s %10.1f %10.1f %6.2fx" % (key, a, b, b / a))
+
+def main():
+    parser = argparse.ArgumentParser(description="GA benchmark")
+    parser.add_argument("--grid", help="JSON file with lists overriding the default grid keys")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-generations", type=int, default=500)
+    parser.add_argument("--time-limit", type=float, default=30, help="per case, seconds")
+    parser.add_argument("--label", default="", help="build label stored in the report")
+    parser.add_argument("--output", "-o", default="-", help="report file, - for stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        bench(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+"""
+    Checkpoint/resume for long GA runs.
+
+    Checkpoint file: magic, u32 header length, JSON header (config,
+    generation, RNG state), then the population as raw ASCII bytes,
+    populationSize * targetLen of them. Loading maps the file and hands the
+    raw block to the population without any per organism parsing.
+
+    Stats log: append-only fixed size records (generation, maxFitness,
+    meanFitness, bestIndex), one per generation.
+
+    ./checkpoint.py [ga.json]   runs the config, resuming from its
+                                checkpoint file if there is one
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from ga import GenerationStats, loadCfg, createPopulation, ProgressPrinter
+
+magic = b"GACKPT01"
+headerLen = struct.Struct("<I")
+
+def saveCheckpoint(pop, cfg, filename):
+    header = json.dumps({
+        "config": cfg,
+        "generation": pop.generation,
+        "rngState": pop.getRngState(),
+    }).encode()
+
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(magic)
+        f.write(headerLen.pack(len(header)))
+        f.write(header)
+        f.write(pop.dump())
+    os.replace(tmp, filename)
+
+def loadCheckpoint(filename):
+    with open(filename, "rb") as f:
+        # private copy-on-write mapping, the population may modify it in place
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    if mm[:len(magic)] != magic:
+        raise ValueError("%s is not a GA checkpoint" % filename)
+    offset = len(magic)
+    size, = headerLen.unpack_from(mm, offset)
+    offset += headerLen.size
+    header = json.loads(mm[offset:offset+size])
+    offset += size
+
+    cfg = header["config"]
+    pop = createPopulation(cfg, seed=cfg.get("seed"))
+    pop.load(memoryview(mm)[offset:])
+    pop.generation = header["generation"]
+    pop.setRngState(header["rngState"])
+    return pop, cfg
+
+class StatsLog:
+    record = struct.Struct("<IIdI")
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.f = open(filename, "ab")
+
+    def write(self, stats):
+        self.f.write(self.record.pack(*stats))
+
+    def flush(self):
+        self.f.flush()
+
+    def truncate(self, generation):
+        """ Drops records from `generation` on, run() yields them again after a resume """
+        self.f.flush()
+        size = 0
+        for stats in self.read(self.filename):
+            if stats.generation >= generation:
+                break
+            size += self.record.size
+        self.f.truncate(size)
+
+    def close(self):
+        self.f.close()
+
+    @staticmethod
+    def read(filename):
+        with open(filename, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % StatsLog.record.size
+        for fields in StatsLog.record.iter_unpack(data[:usable]):
+            yield GenerationStats(*fields)
+
+class Checkpointer:
+    """
+        Passes run() stats through, logging every generation and saving a
+        checkpoint every `every` generations, but not more often than every
+        `interval` seconds
+    """
+    def __init__(self, pop, cfg, filename, every=100, interval=60, statsLog=None):
+        self.pop = pop
+        self.cfg = cfg
+        self.filename = filename
+        self.every = every
+        self.interval = interval
+        self.statsLog = statsLog
+        self.last = time.perf_counter()
+
+    def save(self):
+        if self.statsLog is not None:
+            self.statsLog.flush()
+        saveCheckpoint(self.pop, self.cfg, self.filename)
+        self.last = time.perf_counter()
+
+    def track(self, run):
+        for stats in run:
+            if self.statsLog is not None:
+                self.statsLog.write(stats)
+            if stats.generation % self.every == 0 and time.perf_counter() - self.last >= self.interval:
+                self.save()
+            yield stats
+        self.save()
+
+def main():
+    cfg = loadCfg(sys.argv[1] if len(sys.argv) > 1 else "ga.json")
+    ckpt = cfg.get("checkpoint", {})
+    filename = ckpt.get("file", "ga.ckpt")
+    statsLog = StatsLog(ckpt["statsLog"]) if "statsLog" in ckpt else None
+
+    if os.path.exists(filename):
+        pop, cfg = loadCheckpoint(filename)
+        print("Resuming from generation %i" % pop.generation)
+        if statsLog is not None:
+            statsLog.truncate(pop.generation)
+        run = pop.run(init=False)
+    else:
+        pop = createPopulation(cfg, seed=cfg.get("seed"))
+        run = pop.run()
+
+    checkpointer = Checkpointer(pop, cfg, filename, every=ckpt.get("every", 100),
+                                interval=ckpt.get("interval", 60), statsLog=statsLog)
+    start = time.time()
+    ProgressPrinter(pop).consume(checkpointer.track(run))
+    print("Elap: %fs" % (time.time()-start))
+    if statsLog is not None:
+        statsLog.close()
+
+if __name__ == '__main__':
+    main()
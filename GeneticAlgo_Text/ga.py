@@ -4,94 +4,337 @@ import string
 import math
 import json
 import time
+from collections import namedtuple, defaultdict
+from contextlib import contextmanager, nullcontext
+from selection import getSelection, RouletteSelection
 
 class Organism:
     availableGens = string.ascii_letters + " "
     mutationRate = 0.02
 
-    def __init__(self, dna):
+    def __init__(self, dna, target=None):
         self.dna = dna
         self.len = len(dna)
         self.fitness = 0
+        # bit i set <=> dna[i] matches target, kept in sync by crossover/mutate
+        self.match = 0
+        self.target = None
+        if target is not None:
+            self.getFitness(target)
     
     @staticmethod
-    def generateRandom(maxLength):
-        return Organism(random.choices(Organism.availableGens, k=maxLength))
+    def generateRandom(maxLength, target=None):
+        return Organism(random.choices(Organism.availableGens, k=maxLength), target)
 
-    def mutate(self):
-        if random.random() <= self.mutationRate:
-            self.dna[random.randint(0, self.len-1)] = random.choice(self.availableGens)
+    def mutate(self, rate=None):
+        if random.random() <= (self.mutationRate if rate is None else rate):
+            i = random.randint(0, self.len-1)
+            self.dna[i] = random.choice(self.availableGens)
+            if self.target is not None:
+                self.setMatch(i, self.dna[i] == self.target.dna[i])
+
+    def setMatch(self, i, matches):
+        bit = 1 << i
+        if matches != bool(self.match & bit):
+            self.match ^= bit
+            self.fitness += 1 if matches else -1
 
     def getFitness(self, target):
-        self.fitness = 0
+        """ Full rescan, only needed when the target changes """
+        self.target = target
+        self.match = 0
         for i in range(self.len):
             if self.dna[i] == target.dna[i]:
-                self.fitness += 1
+                self.match |= 1 << i
+        self.fitness = self.match.bit_count()
         return self.fitness
 
     def crossover(self, second):
         #mid = math.floor(self.len/2)
         #newdna = self.dna[:mid] + second.dna[mid:]
-        newdna = [a if random.randint(0,1) else b for a,b in zip(self.dna, second.dna)]
-        return Organism(newdna)
+        mask = random.getrandbits(self.len)
+        bits = format(mask, "0%ib" % self.len)[::-1] if self.len else ""
+        newdna = [a if bit == "1" else b for a, b, bit in zip(self.dna, second.dna, bits)]
+        offspring = Organism(newdna)
+        if self.target is not None:
+            offspring.target = self.target
+            offspring.match = (self.match & mask) | (second.match & ~mask)
+            offspring.fitness = offspring.match.bit_count()
+        return offspring
+
+    @staticmethod
+    def fromBytes(data, target=None):
+        return Organism(list(data.decode("ascii")), target)
+
+    def toBytes(self):
+        return "".join(self.dna).encode("ascii")
+
+    def __str__(self):
+        return "".join(self.dna)
+
+def _expandBits(b):
+    return bytes(0xFF if b >> k & 1 else 0 for k in range(8))
+
+class CompactOrganism:
+    """
+        Organism for big populations: DNA is a bytes object over the ASCII
+        codes of availableGens and the match mask is a bit per gene.
+        Crossover and full fitness scans are done on whole byte strings /
+        ints instead of per gene.
+    """
+    __slots__ = ("dna", "fitness", "match", "target")
+    availableGens = Organism.availableGens
+    gens = availableGens.encode("ascii")
+    mutationRate = Organism.mutationRate
+    # random byte -> 8 byte crossover mask, gene i takes bit i%8 of byte i//8
+    expandTable = [_expandBits(b) for b in range(256)]
+    # 8 bytes of 0/1 -> packed byte
+    packTable = {bytes(b >> k & 1 for k in range(8)): b for b in range(256)}
+    # xor of two genes -> 1 if they are equal
+    matchTable = bytes([1] + [0]*255)
+
+    def __init__(self, dna, target=None):
+        self.dna = dna.encode("ascii") if isinstance(dna, str) else bytes(dna)
+        self.fitness = 0
+        self.match = 0
+        self.target = None
+        if target is not None:
+            self.getFitness(target)
+
+    @property
+    def len(self):
+        return len(self.dna)
+
+    @staticmethod
+    def generateRandom(maxLength, target=None):
+        return CompactOrganism(bytes(random.choices(CompactOrganism.gens, k=maxLength)), target)
+
+    def mutate(self, rate=None):
+        if random.random() <= (self.mutationRate if rate is None else rate):
+            i = random.randint(0, len(self.dna)-1)
+            gen = random.choice(self.gens)
+            self.dna = self.dna[:i] + bytes((gen,)) + self.dna[i+1:]
+            if self.target is not None:
+                self.setMatch(i, gen == self.target.dna[i])
+
+    def setMatch(self, i, matches):
+        bit = 1 << i
+        if matches != bool(self.match & bit):
+            self.match ^= bit
+            self.fitness += 1 if matches else -1
+
+    def getFitness(self, target):
+        """ Full rescan, only needed when the target changes """
+        self.target = target
+        n = len(self.dna)
+        diff = int.from_bytes(self.dna, "little") ^ int.from_bytes(target.dna, "little")
+        equal = diff.to_bytes(n, "little").translate(self.matchTable)
+        equal += bytes(-n % 8)
+        packed = bytes(self.packTable[equal[i:i+8]] for i in range(0, len(equal), 8))
+        self.match = int.from_bytes(packed, "little")
+        self.fitness = self.match.bit_count()
+        return self.fitness
+
+    def crossover(self, second):
+        n = len(self.dna)
+        bits = random.randbytes((n + 7) // 8)
+        mask = int.from_bytes(b"".join(map(self.expandTable.__getitem__, bits))[:n], "little")
+        a = int.from_bytes(self.dna, "little")
+        b = int.from_bytes(second.dna, "little")
+        offspring = CompactOrganism(((a & mask) | (b & ~mask)).to_bytes(n, "little"))
+        if self.target is not None:
+            bits = int.from_bytes(bits, "little")
+            offspring.target = self.target
+            offspring.match = (self.match & bits) | (second.match & ~bits)
+            offspring.fitness = offspring.match.bit_count()
+        return offspring
+
+    @staticmethod
+    def fromBytes(data, target=None):
+        return CompactOrganism(data, target)
+
+    def toBytes(self):
+        return self.dna
+
+    def __str__(self):
+        return self.dna.decode("ascii")
+
+organisms = {
+    "list": Organism,
+    "compact": CompactOrganism,
+}
+
+GenerationStats = namedtuple("GenerationStats", "generation maxFitness meanFitness bestIndex")
+
+class PhaseTimer:
+    """ Accumulates wall time per generation phase """
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] += time.perf_counter() - start
+
+class PopulationRunner:
+    """
+        Generation loop shared by the population backends, which provide
+        initPop(), evaluate() and getStats()
+    """
+    timer = None
 
-class Population:
-    def __init__(self, popSize, target):
+    def phase(self, name):
+        return nullcontext() if self.timer is None else self.timer.phase(name)
+
+    def run(self, maxGenerations=None, timeLimit=None, stop=None, init=True):
+        """
+            Yields GenerationStats for the initial population and after every
+            generation. Ends on convergence, after maxGenerations, after
+            timeLimit seconds or when stop(stats) returns True.
+        """
+        start = time.perf_counter()
+        if init:
+            self.initPop()
+        stats = self.getStats()
+        yield stats
+        while stats.maxFitness < self.targetFitness:
+            if maxGenerations is not None and stats.generation >= maxGenerations:
+                break
+            if timeLimit is not None and time.perf_counter() - start >= timeLimit:
+                break
+            if stop is not None and stop(stats):
+                break
+            self.evaluate()
+            stats = self.getStats()
+            yield stats
+
+    def experiment(self, interval=0.1):
+        ProgressPrinter(self, interval).consume(self.run())
+
+class ProgressPrinter:
+    """ Renders the status line at most every `interval` seconds """
+    def __init__(self, pop, interval=0.1):
+        self.pop = pop
+        self.interval = interval
+        self.last = None
+
+    def show(self, stats):
+        print("\rmaxFit: %i, gen: %i, curBest: %s" % (stats.maxFitness, stats.generation, str(self.pop.bestOrg)), end='')
+
+    def consume(self, run):
+        stats = None
+        for stats in run:
+            now = time.perf_counter()
+            if self.last is None or now - self.last >= self.interval:
+                self.show(stats)
+                self.last = now
+        if stats is not None:
+            self.show(stats)
+        print()
+        return stats
+
+class Population(PopulationRunner):
+    def __init__(self, popSize, target, selection=None, organism=Organism, mutationRate=None):
         self.populationSize = popSize
+        self.organism = organism
+        self.mutationRate = organism.mutationRate if mutationRate is None else mutationRate
         self.targetOrg = target
         self.targetLen = self.targetOrg.len
         self.targetFitness = self.targetLen
         self.population = []
-        self.matchingPool = []
+        self.selection = selection or RouletteSelection()
         self.generation = 0
         self.bestOrg = None
 
     def initPop(self):
         for a in range(self.populationSize):
-            self.population.append(Organism.generateRandom(self.targetLen))
+            self.population.append(self.organism.generateRandom(self.targetLen, self.targetOrg))
+
+    def setTarget(self, target):
+        self.targetOrg = target
+        self.targetLen = self.targetOrg.len
+        self.targetFitness = self.targetLen
+        for org in self.population:
+            org.getFitness(self.targetOrg)
 
     def evaluate(self):
-        self.matchingPool = []
-        for i in range(self.populationSize):
-            self.matchingPool.extend([i]*self.population[i].fitness)
+        with self.phase("selection"):
+            fitness = [org.fitness for org in self.population]
+            parents = self.selection.select(fitness, 2*self.populationSize)
 
-        for a in range(self.populationSize):
-            par1 = self.population[random.choice(self.matchingPool)]
-            par2 = self.population[random.choice(self.matchingPool)]
-            offspring = par1.crossover(par2)
-            offspring.mutate()
-            self.population[a] = offspring
+        with self.phase("crossover"):
+            pop = self.population
+            newPop = [pop[parents[2*a]].crossover(pop[parents[2*a+1]]) for a in range(self.populationSize)]
+
+        with self.phase("mutation"):
+            for offspring in newPop:
+                offspring.mutate(self.mutationRate)
+        self.population = newPop
 
         self.generation += 1
 
     def getMaxFitness(self):
-        maxFit = 0
-        for el in self.population:
-            curFit = el.getFitness(self.targetOrg)
-            if curFit > maxFit:
-                maxFit = curFit
-                self.bestOrg = el
-        return maxFit
-
-    def experiment(self):
-        self.initPop()
-        maxFit = self.getMaxFitness()
-        while maxFit < self.targetFitness:
-            self.evaluate()
-            maxFit = self.getMaxFitness()
-            print("\rmaxFit: %i, gen: %i, curBest: %s" % (maxFit, self.generation, "".join(self.bestOrg.dna)), end='')
-    
-        print()
+        self.bestOrg = max(self.population, key=lambda org: org.fitness)
+        return self.bestOrg.fitness
 
-def setupFromCfg(filename):
-    cnfg = []
+    def dump(self):
+        return b"".join(org.toBytes() for org in self.population)
+
+    def load(self, data):
+        L = self.targetLen
+        self.population = [self.organism.fromBytes(bytes(data[i*L:(i+1)*L]), self.targetOrg)
+                           for i in range(self.populationSize)]
+
+    def getRngState(self):
+        return random.getstate()
+
+    def setRngState(self, state):
+        # JSON turns the state tuple into lists
+        version, internal, gauss = state
+        random.setstate((version, tuple(internal), gauss))
+
+    def getBest(self, count):
+        best = sorted(self.population, key=lambda org: org.fitness, reverse=True)[:count]
+        return b"".join(org.toBytes() for org in best)
+
+    def addMigrants(self, data):
+        migrants = [self.organism.fromBytes(data[i:i+self.targetLen], self.targetOrg)
+                    for i in range(0, len(data), self.targetLen)]
+        worst = sorted(range(self.populationSize), key=lambda i: self.population[i].fitness)
+        for i, org in zip(worst, migrants):
+            self.population[i] = org
+
+    def getStats(self):
+        with self.phase("fitness"):
+            fitness = [org.fitness for org in self.population]
+            best = max(range(len(fitness)), key=fitness.__getitem__)
+        self.bestOrg = self.population[best]
+        return GenerationStats(self.generation, fitness[best], sum(fitness)/len(fitness), best)
+
+def loadCfg(filename):
     with open(filename) as f:
-        cnfg = json.load(f)
-    Organism.mutationRate = cnfg["mutationRate"]
-    targetOrg = Organism(cnfg["targetOrg"])
-    pop = Population(target=targetOrg, popSize=cnfg["populationSize"])
+        return json.load(f)
+
+def createPopulation(cnfg, seed=None):
+    organism = organisms[cnfg.get("organism", "list")]
+    targetOrg = organism(cnfg["targetOrg"])
+    selection = getSelection(cnfg.get("selection", "roulette"), **cnfg.get("selectionArgs", {}))
+    if cnfg.get("backend", "python") == "numpy":
+        from ga_np import NumpyPopulation
+        return NumpyPopulation(target=targetOrg, popSize=cnfg["populationSize"], seed=seed, selection=selection,
+                               mutationRate=cnfg["mutationRate"])
+    random.seed(seed)
+    pop = Population(target=targetOrg, popSize=cnfg["populationSize"], selection=selection, organism=organism,
+                     mutationRate=cnfg["mutationRate"])
     return pop
 
+def setupFromCfg(filename):
+    cnfg = loadCfg(filename)
+    return createPopulation(cnfg, seed=cnfg.get("seed"))
+
 def main():
     pop = setupFromCfg("ga.json")
     #pop = Population(target=Organism("Cotidie Morimur"))
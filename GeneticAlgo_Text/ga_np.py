@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+"""
+    NumPy backend for the text GA.
+    The whole population lives in one (populationSize, targetLen) uint8 array
+    of ASCII codes, so fitness, crossover and mutation run once per generation
+    instead of once per gene.
+"""
+import numpy as np
+from ga import Organism, PopulationRunner, GenerationStats
+from selection import RouletteSelection
+
+class NumpyPopulation(PopulationRunner):
+    def __init__(self, popSize, target, mutationRate=None, seed=None, selection=None):
+        self.populationSize = popSize
+        self.targetOrg = target
+        self.target = np.frombuffer(str(target).encode("ascii"), dtype=np.uint8)
+        self.targetLen = self.target.size
+        self.targetFitness = self.targetLen
+        self.mutationRate = Organism.mutationRate if mutationRate is None else mutationRate
+        self.gens = np.frombuffer(Organism.availableGens.encode("ascii"), dtype=np.uint8)
+        self.rng = np.random.default_rng(seed)
+        self.selection = selection or RouletteSelection()
+        self.population = None
+        self.fitness = None
+        self.generation = 0
+        self.bestIdx = None
+
+    def initPop(self):
+        idx = self.rng.integers(self.gens.size, size=(self.populationSize, self.targetLen))
+        self.population = self.gens[idx]
+        self.fitness = np.zeros(self.populationSize, dtype=np.int64)
+
+    def getFitness(self):
+        self.fitness = np.count_nonzero(self.population == self.target, axis=1)
+        return self.fitness
+
+    def crossover(self, par1, par2):
+        bits = self.rng.integers(0, 256, size=(par1.size, (self.targetLen + 7) // 8), dtype=np.uint8)
+        mask = np.unpackbits(bits, axis=1, count=self.targetLen).view(bool)
+        offspring = self.population[par2]
+        np.copyto(offspring, self.population[par1], where=mask)
+        return offspring
+
+    def mutate(self, offspring):
+        rows = np.flatnonzero(self.rng.random(offspring.shape[0]) <= self.mutationRate)
+        cols = self.rng.integers(self.targetLen, size=rows.size)
+        offspring[rows, cols] = self.gens[self.rng.integers(self.gens.size, size=rows.size)]
+
+    def evaluate(self):
+        with self.phase("selection"):
+            par1 = self.selection.selectArray(self.fitness, self.populationSize, self.rng)
+            par2 = self.selection.selectArray(self.fitness, self.populationSize, self.rng)
+        with self.phase("crossover"):
+            offspring = self.crossover(par1, par2)
+        with self.phase("mutation"):
+            self.mutate(offspring)
+        self.population = offspring
+        self.generation += 1
+
+    def getOrganism(self, i):
+        return Organism(list(self.population[i].tobytes().decode("ascii")))
+
+    @property
+    def bestOrg(self):
+        return None if self.bestIdx is None else self.getOrganism(self.bestIdx)
+
+    def getMaxFitness(self):
+        self.getFitness()
+        self.bestIdx = int(np.argmax(self.fitness))
+        return int(self.fitness[self.bestIdx])
+
+    def dump(self):
+        return np.ascontiguousarray(self.population).data
+
+    def load(self, data):
+        size = self.populationSize * self.targetLen
+        self.population = np.frombuffer(data, dtype=np.uint8, count=size).reshape(self.populationSize, self.targetLen)
+        self.getFitness()
+
+    def getRngState(self):
+        return self.rng.bit_generator.state
+
+    def setRngState(self, state):
+        self.rng.bit_generator.state = state
+
+    def getBest(self, count):
+        count = min(count, self.populationSize)
+        idx = np.argpartition(self.fitness, self.populationSize - count)[self.populationSize - count:]
+        return self.population[idx].tobytes()
+
+    def addMigrants(self, data):
+        migrants = np.frombuffer(data, dtype=np.uint8).reshape(-1, self.targetLen)[:self.populationSize]
+        count = migrants.shape[0]
+        if count == 0:
+            return
+        worst = np.argpartition(self.fitness, count - 1)[:count]
+        self.population[worst] = migrants
+        self.fitness[worst] = np.count_nonzero(migrants == self.target, axis=1)
+
+    def getStats(self):
+        with self.phase("fitness"):
+            self.getFitness()
+            self.bestIdx = int(np.argmax(self.fitness))
+        return GenerationStats(self.generation, int(self.fitness[self.bestIdx]), float(self.fitness.mean()), self.bestIdx)
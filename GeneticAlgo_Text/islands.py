@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+"""
+    Island model runner for the text GA.
+    Every island is an independent population in its own process. Every
+    `interval` generations an island publishes its best organisms as raw
+    ASCII bytes into its shared slot and replaces its worst organisms with
+    the ones its neighbours published. The first island to reach the target
+    sets a shared event which stops all the others.
+"""
+import ctypes
+import multiprocessing as mp
+import sys
+import time
+from ga import loadCfg, createPopulation
+
+topologies = ("ring", "full")
+
+# per process state, set by initIsland
+_cfg = None
+_slots = None
+_stamps = None
+_stop = None
+
+def initIsland(cfg, slots, stamps, stop):
+    global _cfg, _slots, _stamps, _stop
+    _cfg, _slots, _stamps, _stop = cfg, slots, stamps, stop
+
+def neighbours(island, count, topology):
+    if topology == "ring":
+        return [(island - 1) % count] if count > 1 else []
+    return [i for i in range(count) if i != island]
+
+def publish(island, data, generation):
+    slot = _slots[island]
+    with slot.get_lock():
+        ctypes.memmove(slot.get_obj(), data, len(data))
+        _stamps[island] = generation
+
+def collect(island, topology):
+    data = b""
+    for n in neighbours(island, len(_slots), topology):
+        slot = _slots[n]
+        with slot.get_lock():
+            if _stamps[n] > 0:
+                data += bytes(slot.get_obj())
+    return data
+
+def runIsland(island):
+    cfg = _cfg["islands"]
+    interval = cfg.get("migrationInterval", 20)
+    migrants = cfg.get("migrants", 5)
+    topology = cfg.get("topology", "ring")
+    maxGenerations = cfg.get("maxGenerations")
+
+    seed = _cfg.get("seed")
+    pop = createPopulation(_cfg, seed=None if seed is None else seed + island)
+    for stats in pop.run(maxGenerations=maxGenerations, stop=lambda stats: _stop.is_set()):
+        if stats.generation and stats.generation % interval == 0:
+            publish(island, pop.getBest(migrants), stats.generation)
+            pop.addMigrants(collect(island, topology))
+
+    if stats.maxFitness >= pop.targetFitness:
+        _stop.set()
+    return island, stats.generation, stats.maxFitness, str(pop.bestOrg)
+
+class IslandModel:
+    def __init__(self, cfg):
+        islands = cfg.setdefault("islands", {})
+        self.cfg = cfg
+        self.count = islands.get("count", mp.cpu_count())
+        topology = islands.get("topology", "ring")
+        if topology not in topologies:
+            raise ValueError("Unknown topology: %s (available: %s)" % (topology, ", ".join(topologies)))
+        slotSize = islands.get("migrants", 5) * len(cfg["targetOrg"])
+        self.slots = [mp.Array(ctypes.c_ubyte, slotSize) for _ in range(self.count)]
+        self.stamps = mp.RawArray(ctypes.c_int, self.count)
+        self.stop = mp.Event()
+
+    def run(self):
+        with mp.Pool(self.count, initializer=initIsland,
+                     initargs=(self.cfg, self.slots, self.stamps, self.stop)) as pool:
+            return pool.map(runIsland, range(self.count))
+
+def main():
+    cfg = loadCfg(sys.argv[1] if len(sys.argv) > 1 else "ga.json")
+    model = IslandModel(cfg)
+    start = time.time()
+    results = model.run()
+    for island, generation, maxFit, best in results:
+        print("island %i: maxFit: %i, gen: %i, curBest: %s" % (island, maxFit, generation, best))
+    print("Elap: %fs" % (time.time()-start))
+
+if __name__ == '__main__':
+    main()
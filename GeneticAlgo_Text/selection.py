@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+"""
+    Parent selection strategies for the text GA.
+    select() works on a list of fitness values with the `random` module,
+    selectArray() on a numpy array with a numpy Generator (NumPy backend).
+    Both return `count` population indices and never allocate more than
+    O(populationSize) memory, whatever the fitness values are.
+"""
+import random
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class RouletteSelection:
+    """ Fitness proportional sampling over cumulative weights """
+    def select(self, fitness, count, rng=random):
+        cum = list(accumulate(fitness))
+        if not cum or cum[-1] <= 0:
+            return [rng.randrange(len(fitness)) for _ in range(count)]
+        return rng.choices(range(len(fitness)), cum_weights=cum, k=count)
+
+    def selectArray(self, fitness, count, rng):
+        cum = np.cumsum(fitness)
+        total = int(cum[-1])
+        if total <= 0:
+            return rng.integers(fitness.size, size=count)
+        return np.searchsorted(cum, rng.integers(total, size=count), side="right")
+
+class AliasSelection:
+    """ Fitness proportional sampling with Vose's alias table, O(1) per draw """
+    def buildTable(self, fitness):
+        n = len(fitness)
+        total = sum(fitness)
+        prob = [f * n / total for f in fitness]
+        alias = list(range(n))
+        small = [i for i, p in enumerate(prob) if p < 1.0]
+        large = [i for i, p in enumerate(prob) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large[-1]
+            alias[s] = l
+            prob[l] -= 1.0 - prob[s]
+            if prob[l] < 1.0:
+                small.append(large.pop())
+        for i in small + large:
+            prob[i] = 1.0
+        return prob, alias
+
+    def select(self, fitness, count, rng=random):
+        n = len(fitness)
+        if sum(fitness) <= 0:
+            return [rng.randrange(n) for _ in range(count)]
+        prob, alias = self.buildTable(fitness)
+        out = []
+        for _ in range(count):
+            i = rng.randrange(n)
+            out.append(i if rng.random() < prob[i] else alias[i])
+        return out
+
+    def selectArray(self, fitness, count, rng):
+        if int(fitness.sum()) <= 0:
+            return rng.integers(fitness.size, size=count)
+        prob, alias = self.buildTable(fitness.tolist())
+        prob = np.asarray(prob)
+        alias = np.asarray(alias)
+        idx = rng.integers(fitness.size, size=count)
+        return np.where(rng.random(count) < prob[idx], idx, alias[idx])
+
+class TournamentSelection:
+    """ Best of `size` uniformly drawn organisms """
+    def __init__(self, size=2):
+        self.size = size
+
+    def select(self, fitness, count, rng=random):
+        n = len(fitness)
+        return [max((rng.randrange(n) for _ in range(self.size)), key=fitness.__getitem__)
+                for _ in range(count)]
+
+    def selectArray(self, fitness, count, rng):
+        idx = rng.integers(fitness.size, size=(count, self.size))
+        best = np.argmax(fitness[idx], axis=1)
+        return idx[np.arange(count), best]
+
+class RankSelection:
+    """ Sampling proportional to rank (worst=1, best=populationSize) """
+    def select(self, fitness, count, rng=random):
+        n = len(fitness)
+        order = sorted(range(n), key=fitness.__getitem__)
+        cum = [r * (r + 1) // 2 for r in range(1, n + 1)]
+        return rng.choices(order, cum_weights=cum, k=count)
+
+    def selectArray(self, fitness, count, rng):
+        n = fitness.size
+        order = np.argsort(fitness, kind="stable")
+        cum = np.cumsum(np.arange(1, n + 1))
+        return order[np.searchsorted(cum, rng.integers(int(cum[-1]), size=count), side="right")]
+
+selections = {
+    "roulette": RouletteSelection,
+    "alias": AliasSelection,
+    "tournament": TournamentSelection,
+    "rank": RankSelection,
+}
+
+def getSelection(name="roulette", **kwargs):
+    if name not in selections:
+        raise ValueError("Unknown selection: %s (available: %s)" % (name, ", ".join(selections)))
+    return selections[name](**kwargs)
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+"""
+    Parameter sweep for the text GA.
+    Any ga.json key may hold a list of values or an inclusive range
+    {"start": 0.01, "stop": 0.05, "step": 0.01}; every combination is run
+    `repeats` times with seeds seed, seed+1, ... across a process pool.
+    Each run gets its own config dict, nothing is shared between runs.
+
+    Optional "sweep" block: repeats, workers, maxGenerations, timeLimit.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import statistics
+import time
+from ga import loadCfg, createPopulation
+
+def expandValue(value):
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict) and {"start", "stop"} <= value.keys():
+        start, stop, step = value["start"], value["stop"], value.get("step", 1)
+        count = int((stop - start) / step + 1e-9) + 1
+        return [round(start + i*step, 10) for i in range(count)]
+    return [value]
+
+def expandGrid(cfg):
+    """ Returns (swept keys, list of config dicts) """
+    cfg = {k: v for k, v in cfg.items() if k != "sweep"}
+    values = {k: expandValue(v) for k, v in cfg.items()}
+    keys = [k for k, v in values.items() if len(v) > 1]
+    combos = []
+    for combo in itertools.product(*values.values()):
+        combos.append(dict(zip(values, combo)))
+    return keys, combos
+
+def runOne(job):
+    cfg, maxGenerations, timeLimit = job
+    pop = createPopulation(cfg, seed=cfg.get("seed"))
+    start = time.perf_counter()
+    for stats in pop.run(maxGenerations=maxGenerations, timeLimit=timeLimit):
+        pass
+    return {
+        "config": cfg,
+        "generations": stats.generation,
+        "maxFitness": stats.maxFitness,
+        "converged": stats.maxFitness >= pop.targetFitness,
+        "elapsed": time.perf_counter() - start,
+    }
+
+def aggregate(keys, results):
+    groups = {}
+    for r in results:
+        params = tuple(json.dumps(r["config"][k]) for k in keys)
+        groups.setdefault(params, []).append(r)
+
+    rows = []
+    for params, runs in groups.items():
+        converged = [r for r in runs if r["converged"]]
+        gens = [r["generations"] for r in converged]
+        rows.append({
+            "params": {k: json.loads(p) for k, p in zip(keys, params)},
+            "runs": len(runs),
+            "converged": len(converged),
+            "meanGenerations": statistics.mean(gens) if gens else None,
+            "medianGenerations": statistics.median(gens) if gens else None,
+            "stdevGenerations": statistics.stdev(gens) if len(gens) > 1 else None,
+            "meanTime": statistics.mean(r["elapsed"] for r in runs),
+        })
+    return rows
+
+def formatNum(value):
+    if value is None:
+        return "-"
+    return "%.1f" % value if isinstance(value, float) else str(value)
+
+def printTable(keys, rows):
+    cols = keys + ["runs", "converged", "meanGen", "medianGen", "stdevGen", "meanTime"]
+    table = [[json.dumps(r["params"][k]) for k in keys] +
+             [str(r["runs"]), str(r["converged"]), formatNum(r["meanGenerations"]),
+              formatNum(r["medianGenerations"]), formatNum(r["stdevGenerations"]), "%.3fs" % r["meanTime"]]
+             for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in table)) for i, c in enumerate(cols)]
+    print("  ".join(c.rjust(w) for c, w in zip(cols, widths)))
+    for row in table:
+        print("  ".join(v.rjust(w) for v, w in zip(row, widths)))
+
+def main():
+    parser = argparse.ArgumentParser(description="GA parameter sweep")
+    parser.add_argument("config", nargs="?", default="ga.json")
+    parser.add_argument("--output", "-o", help="write runs and aggregated rows as JSON")
+    args = parser.parse_args()
+
+    cfg = loadCfg(args.config)
+    sweep = cfg.get("sweep", {})
+    repeats = sweep.get("repeats", 5)
+    seed = cfg.get("seed") or 0
+    keys, combos = expandGrid(cfg)
+
+    jobs = []
+    for combo in combos:
+        for r in range(repeats):
+            jobs.append((dict(combo, seed=seed + r), sweep.get("maxGenerations"), sweep.get("timeLimit")))
+
+    start = time.time()
+    with mp.Pool(sweep.get("workers")) as pool:
+        results = list(pool.imap(runOne, jobs))
+    rows = aggregate(keys, results)
+
+    printTable(keys, rows)
+    print("%i runs, elap: %fs" % (len(jobs), time.time()-start))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"keys": keys, "rows": rows, "runs": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
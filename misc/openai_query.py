@@ -1,11 +1,20 @@
 #!/bin/env python3
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion as ChatCompletionResponse
+from playhouse.migrate import SqliteMigrator, migrate
+from collections import OrderedDict
+import openai
 import peewee
+import asyncio
 import datetime
+import hashlib
 import pathlib
 import argparse
 import json
+import random
+import sys
+import time
 
 
 class Config:
@@ -32,22 +41,115 @@ class ChatCompletion(peewee.Model):
     comletion_tokens = peewee.IntegerField()
     model = peewee.TextField()
     creation_date = peewee.DateTimeField(default=datetime.datetime.now)
+    # hash of the normalized messages and requested model, NULL once evicted
+    cache_key = peewee.CharField(null=True, index=True)
+    response = peewee.TextField(null=True)
 
     class Meta:
         database = database
 
 
+def cache_key(messages, model):
+    normalized = [{'role': m['role'].strip().lower(), 'content': m['content'].strip()}
+                  for m in messages]
+    data = json.dumps([normalized, model], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Responses by cache_key(), an LRU in memory in front of the
+    ChatCompletion table. Entries older than ttl seconds are misses,
+    only the newest max_entries rows stay keyed in the db.
+    """
+    def __init__(self, maxsize=256, ttl=None, max_entries=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, created):
+        return self.ttl is not None and \
+            datetime.datetime.now() - created > datetime.timedelta(seconds=self.ttl)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and self._expired(entry[0]):
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            row = (ChatCompletion.select(ChatCompletion.creation_date, ChatCompletion.response)
+                   .where(ChatCompletion.cache_key == key)
+                   .order_by(ChatCompletion.id.desc()).first())
+            if row is None or row.response is None or self._expired(row.creation_date):
+                self.misses += 1
+                return None
+            entry = (row.creation_date,
+                     ChatCompletionResponse.model_validate_json(row.response))
+            self._remember(key, entry)
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, response, created):
+        self.add(key, response, created)
+        self.evict()
+
+    def add(self, key, response, created):
+        """ Only the in-memory part, for rows the caller writes itself """
+        self._remember(key, (created, response))
+
+    def evict(self):
+        if self.max_entries is not None:
+            keep = (ChatCompletion.select(ChatCompletion.id)
+                    .where(ChatCompletion.cache_key.is_null(False))
+                    .order_by(ChatCompletion.id.desc()).limit(self.max_entries))
+            (ChatCompletion.update(cache_key=None)
+             .where(ChatCompletion.cache_key.is_null(False), ChatCompletion.id.not_in(keep))
+             .execute())
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        ChatCompletion.update(cache_key=None).execute()
+
+
 class Client:
-    def __init__(self, db_name='chat.db'):
+    def __init__(self, db_name='chat.db', cache_size=256, cache_ttl=None,
+                 cache_max_entries=None, base_url=None):
         basePath = pathlib.Path(__file__).parent
         self.config = Config.load(basePath / 'config.json')
+        # None falls back to OPENAI_BASE_URL or the real API
+        self.base_url = base_url or getattr(self.config, 'base_url', None)
         self.client = OpenAI(
             api_key=self.config.api_key,
+            base_url=self.base_url,
         )
         database.init(basePath / db_name)
         database.connect()
         if not database.table_exists('chatcompletion'):
             database.create_tables([ChatCompletion])
+        else:
+            self._migrate()
+        self.cache = ResponseCache(cache_size, cache_ttl, cache_max_entries)
+
+    def _migrate(self):
+        # dbs created before the response cache
+        columns = [c.name for c in database.get_columns('chatcompletion')]
+        if 'cache_key' in columns:
+            return
+        migrator = SqliteMigrator(database)
+        migrate(
+            migrator.add_column('chatcompletion', 'cache_key', ChatCompletion.cache_key),
+            migrator.add_column('chatcompletion', 'response', ChatCompletion.response),
+        )
 
     def _convert_model(self, model):
         if isinstance(model, int):
@@ -71,22 +173,37 @@ class Client:
             model=model,
         )
 
-    def chat(self, message, model=3):
+    def chat(self, message, model=3, use_cache=True):
+        """ use_cache=False always asks the API, the answer still refreshes the cache """
         model = self._convert_model(model)
-        response = self._chat(self._make_message(message), model=model)
-        self.save(response, message)
+        messages = self._make_message(message)
+        key = cache_key(messages, model)
+        if use_cache:
+            response = self.cache.get(key)
+            if response is not None:
+                return response
+        response = self._chat(messages, model=model)
+        self.save(response, message, key)
         return response
 
     def _make_message(self, message):
         return [{'role': 'user', 'content': message}]
 
-    def save(self, response, message):
-        completion = ChatCompletion(query=message,
-                                    content=response.choices[0].message.content,
-                                    prompt_tokens=response.usage.prompt_tokens,
-                                    comletion_tokens=response.usage.completion_tokens,
-                                    model=response.model)
-        completion.save()
+    def _row(self, response, message, key=None):
+        return dict(query=message,
+                    content=response.choices[0].message.content,
+                    prompt_tokens=response.usage.prompt_tokens,
+                    comletion_tokens=response.usage.completion_tokens,
+                    model=response.model,
+                    cache_key=key,
+                    response=response.model_dump_json(),
+                    creation_date=datetime.datetime.now())
+
+    def save(self, response, message, key=None):
+        row = self._row(response, message, key)
+        ChatCompletion.create(**row)
+        if key is not None:
+            self.cache.put(key, response, row['creation_date'])
 
     def show_db(self):
         for chat in ChatCompletion.select():
@@ -94,18 +211,146 @@ class Client:
                   chat.comletion_tokens, chat.creation_date)
 
 
+class BatchRunner:
+    """
+    Sends many queries through AsyncOpenAI with at most `concurrency`
+    in flight. Rate limits, connection errors and 5xx answers are retried
+    after the server's Retry-After or an exponential backoff. Results are
+    written as JSON Lines in completion order, new answers are inserted
+    into the db flush_every rows at a time.
+    """
+    retryable = (openai.RateLimitError, openai.APIConnectionError,
+                 openai.InternalServerError)
+
+    def __init__(self, client, concurrency=8, max_retries=5, backoff=1.0,
+                 flush_every=50):
+        self.client = client
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.flush_every = flush_every
+        self.pending = []
+        self.aclient = AsyncOpenAI(api_key=client.config.api_key,
+                                   base_url=client.base_url,
+                                   max_retries=0)
+
+    def _delay(self, error, attempt):
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                return float(response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                pass
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    async def _chat(self, messages, model):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.aclient.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                )
+            except self.retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._delay(e, attempt))
+
+    async def query(self, index, message, model, use_cache=True):
+        start = time.perf_counter()
+        messages = self.client._make_message(message)
+        key = cache_key(messages, model)
+        response = self.client.cache.get(key) if use_cache else None
+        cached = response is not None
+        if not cached:
+            try:
+                response = await self._chat(messages, model)
+            except openai.OpenAIError as e:
+                return {'index': index, 'query': message, 'error': repr(e)}
+            self.pending.append((self.client._row(response, message, key), response))
+        return {
+            'index': index,
+            'query': message,
+            'content': response.choices[0].message.content if response.choices else None,
+            'model': response.model,
+            'prompt_tokens': response.usage.prompt_tokens,
+            'completion_tokens': response.usage.completion_tokens,
+            'cached': cached,
+            'elapsed': round(time.perf_counter() - start, 4),
+        }
+
+    def flush(self):
+        if not self.pending:
+            return
+        with database.atomic():
+            ChatCompletion.insert_many([row for row, _ in self.pending]).execute()
+        for row, response in self.pending:
+            self.client.cache.add(row['cache_key'], response, row['creation_date'])
+        self.client.cache.evict()
+        self.pending = []
+
+    async def run(self, prompts, model, out, use_cache=True):
+        model = self.client._convert_model(model)
+        count = 0
+
+        def write(tasks):
+            nonlocal count
+            for task in tasks:
+                out.write(json.dumps(task.result()) + '\n')
+                count += 1
+            out.flush()
+            if len(self.pending) >= self.flush_every:
+                self.flush()
+
+        try:
+            pending = set()
+            for index, message in enumerate(prompts):
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    write(done)
+                pending.add(asyncio.ensure_future(self.query(index, message, model, use_cache)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                write(done)
+        finally:
+            self.flush()
+            await self.aclient.close()
+        return count
+
+
+def read_prompts(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield line
+
+
 class CLI:
     def run(self):
         parser = argparse.ArgumentParser()
-        parser.add_argument('query', help='query to send to chatGPT')
+        parser.add_argument('query', nargs='?', help='query to send to chatGPT')
+        parser.add_argument('--batch', '-b', metavar='FILE',
+                            help='send every line of FILE (- for stdin) as a query, '
+                                 'print the results as JSON Lines')
+        parser.add_argument('--concurrency', '-j', type=int, default=8,
+                            help='queries in flight in batch mode. Default: 8')
+        parser.add_argument('--base-url', help='API endpoint, e.g. a local stub server')
         parser.add_argument('--model', '-m', type=int, default=4,
                             help='model to use (3,4 or 40). Default: 4')
         parser.add_argument('--tts', '-t', action='store_true')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='always ask the API, even for a cached query')
+        parser.add_argument('--cache-ttl', type=int, default=None,
+                            help='ignore cached answers older than this many seconds')
         args = parser.parse_args()
+        if args.batch:
+            self.run_batch(args)
+            return
+        if args.query is None:
+            parser.error('a query or --batch is required')
 
         start = datetime.datetime.now()
-        c = Client('cli.db')
-        resp = c.chat(args.query, model=args.model)
+        c = Client('cli.db', cache_ttl=args.cache_ttl, base_url=args.base_url)
+        resp = c.chat(args.query, model=args.model, use_cache=not args.no_cache)
         elapsed = datetime.datetime.now() - start
 
         if len(resp.choices) == 0:
@@ -117,6 +362,21 @@ class CLI:
             print(f'GPT-{args.model} ({elapsed.total_seconds()}s):')
         print(resp.choices[0].message.content)
 
+    def run_batch(self, args):
+        c = Client('cli.db', cache_ttl=args.cache_ttl, base_url=args.base_url)
+        runner = BatchRunner(c, concurrency=args.concurrency)
+        start = time.perf_counter()
+        if args.batch == '-':
+            count = asyncio.run(runner.run(read_prompts(sys.stdin), args.model, sys.stdout,
+                                           use_cache=not args.no_cache))
+        else:
+            with open(args.batch) as f:
+                count = asyncio.run(runner.run(read_prompts(f), args.model, sys.stdout,
+                                               use_cache=not args.no_cache))
+        elapsed = time.perf_counter() - start
+        print(f'{count} queries in {elapsed:.2f}s, {count / elapsed if elapsed else 0:.1f} queries/s',
+              file=sys.stderr)
+
 
 if __name__ == '__main__':
     args = CLI().run()
@@ -0,0 +1,93 @@
+#!/bin/env python3
+"""
+Local stand-in for the chat completions API, for trying openai_query
+without tokens:
+
+    ./openai_stub.py --port 8000 --latency 200 --rate-limit-every 20 &
+    ./openai_query.py --base-url http://127.0.0.1:8000/v1 --batch prompts.txt
+
+Answers echo the last message. Every n-th request can be answered with
+429 and a Retry-After header to exercise the retry path.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import itertools
+import json
+import threading
+import time
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    def _send(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send(200, {'object': 'list', 'data': [
+                {'id': 'stub', 'object': 'model', 'created': 0, 'owned_by': 'stub'}]})
+        else:
+            self._send(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send(404, {'error': {'message': 'not found'}})
+            return
+        with self.lock:
+            n = next(self.counter)
+        args = self.server.args
+        if args.rate_limit_every and n % args.rate_limit_every == 0:
+            self._send(429, {'error': {'message': 'rate limited', 'type': 'rate_limit'}},
+                       headers=[('Retry-After', str(args.retry_after))])
+            return
+        time.sleep(args.latency / 1000)
+        content = body['messages'][-1]['content']
+        prompt_tokens = sum(len(m['content'].split()) for m in body['messages'])
+        self._send(200, {
+            'id': f'chatcmpl-stub-{n}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': f'echo: {content}'}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': prompt_tokens + 1,
+                      'total_tokens': 2 * prompt_tokens + 1},
+        })
+
+    def log_message(self, format, *args):
+        if self.server.args.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=100, help='ms per answer')
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='answer every n-th request with 429')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='seconds')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    server.args = args
+    print(f'Listening on http://127.0.0.1:{args.port}/v1')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
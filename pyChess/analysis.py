@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+import shlex
+import subprocess as sp
+import threading
+from collections import namedtuple
+import pygame
+
+# posted to wake the render loop when there is a new Analysis to take()
+ANALYSIS = pygame.event.custom_type()
+
+Analysis = namedtuple('Analysis', 'search depth score mate pv')
+
+def parseInfo(line, search):
+    """ Analysis from an info line with a score and pv, else None. Scores are from the side to move. """
+    tokens = line.split()
+    depth = score = mate = None
+    pv = ()
+    i = 1
+    while i < len(tokens):
+        key = tokens[i]
+        if key == 'depth':
+            depth = int(tokens[i + 1])
+        elif key == 'score' and i + 2 < len(tokens):
+            if tokens[i + 1] == 'cp':
+                score = int(tokens[i + 2])
+            elif tokens[i + 1] == 'mate':
+                mate = int(tokens[i + 2])
+            i += 1
+        elif key == 'multipv' and tokens[i + 1] != '1':
+            return None
+        elif key == 'pv':
+            pv = tuple(tokens[i + 1:])
+            break
+        i += 1
+    if not pv or (score is None and mate is None):
+        return None
+    return Analysis(search, depth, score, mate, pv)
+
+class AnalysisWorker:
+    """
+        Keeps a UCI engine searching the current position with go infinite.
+        The reader thread puts only the newest Analysis into `latest` and
+        posts one ANALYSIS event until the render loop picks it up with
+        take(), so a fast engine can't flood the event queue. analyse()
+        stops the running search and starts the next one, lines still
+        coming from the stopped search are dropped. If the engine exits or
+        its pipe breaks the worker goes `dead` and ignores all calls, engine
+        I/O errors never reach the render loop.
+    """
+    def __init__(self, engineCmd):
+        self.eng = sp.Popen(shlex.split(engineCmd), stdin=sp.PIPE, stdout=sp.PIPE, universal_newlines=True, bufsize=1)
+        self.latest = None
+        self.wakePending = False
+        self.started = 0
+        self.finished = 0
+        self.dead = False
+        self.reader = threading.Thread(target=self.readerThread, daemon=True)
+        self.reader.start()
+        self.send('uci')
+
+    def send(self, cmd):
+        if self.dead:
+            return
+        try:
+            self.eng.stdin.write(cmd + '\n')
+            self.eng.stdin.flush()
+        except OSError:
+            self.dead = True
+
+    def readerThread(self):
+        for line in self.eng.stdout:
+            if line.startswith('bestmove'):
+                self.finished += 1
+            elif line.startswith('info') and self.finished + 1 == self.started:
+                info = parseInfo(line, self.started)
+                if info is None:
+                    continue
+                self.latest = info
+                self.wake()
+        # engine exited, let the render loop clear the panel
+        self.dead = True
+        self.wake()
+
+    def wake(self):
+        if not self.wakePending:
+            self.wakePending = True
+            pygame.event.post(pygame.event.Event(ANALYSIS))
+
+    def analyse(self, fen):
+        if self.dead:
+            return
+        if self.started > self.finished:
+            self.send('stop')
+        self.started += 1
+        self.send(f'position fen {fen}\ngo infinite')
+
+    def stop(self):
+        if self.started > self.finished:
+            self.send('stop')
+
+    def take(self):
+        """ Newest Analysis of the current search, or None """
+        self.wakePending = False
+        latest = self.latest
+        if self.dead or latest is None or latest.search != self.started:
+            return None
+        return latest
+
+    def close(self):
+        self.stop()
+        self.send('quit')
+        try:
+            self.eng.wait(timeout=2)
+        except sp.TimeoutExpired:
+            self.eng.kill()
+        self.reader.join(timeout=1)
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+"""
+    Headless rendering benchmark.
+    Runs the App with SDL's dummy video driver and replays scripted event
+    streams, one App.processEvents() + App.render() per frame, and reports
+    event handling and render time percentiles and frames/s per scenario.
+
+    ./bench.py -o before.json
+    ./bench.py --frames 2000 --scenario drag reset
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from main import App
+from piece import PieceType, PieceColor
+
+def placeholderAtlas(directory, cell=80):
+    """ Writes a pieces.png of plain discs, for running without the real piece images """
+    atlas = pygame.Surface((cell * len(PieceType), cell * len(PieceColor)), pygame.SRCALPHA)
+    for t in PieceType:
+        for c in PieceColor:
+            center = ((t.value - 1) * cell + cell // 2, (c.value - 1) * cell + cell // 2)
+            pygame.draw.circle(atlas, (250, 250, 250) if c == PieceColor.White else (20, 20, 20), center, cell * 3 // 8)
+            pygame.draw.circle(atlas, (200, 30, 30), center, t.value * cell // 20)
+    pygame.image.save(atlas, os.path.join(directory, "pieces.png"))
+
+def squareCenter(app, name):
+    board = app.board
+    x, y = board.squareXY["abcdefgh".index(name[0]) + 8 * (int(name[1]) - 1)]
+    return (board.position[0] + x + board.square_size // 2, board.position[1] + y + board.square_size // 2)
+
+def mouse(type, pos, **kw):
+    if type == pygame.MOUSEMOTION:
+        return pygame.event.Event(type, pos=pos, rel=(0, 0), buttons=(1, 0, 0))
+    return pygame.event.Event(type, pos=pos, button=1)
+
+def dragFrames(app, frames, steps):
+    """ Knight b1-c3 and back, `steps` motion frames per drag """
+    script = []
+    route = [("b1", "c3"), ("c3", "b1")]
+    while len(script) < frames:
+        src, dst = route[len(script) // (steps + 2) % 2]
+        a, b = squareCenter(app, src), squareCenter(app, dst)
+        script.append([mouse(pygame.MOUSEBUTTONDOWN, a)])
+        for i in range(1, steps + 1):
+            pos = (a[0] + (b[0] - a[0]) * i // steps, a[1] + (b[1] - a[1]) * i // steps)
+            script.append([mouse(pygame.MOUSEMOTION, pos)])
+        script.append([mouse(pygame.MOUSEBUTTONUP, b)])
+    return script[:frames]
+
+def resetFrames(app, frames, steps):
+    return [[pygame.event.Event(pygame.KEYUP, key=pygame.K_r, mod=0, unicode="r", scancode=0)]
+            for _ in range(frames)]
+
+def clickFrames(app, frames, steps):
+    """ Clicks on empty squares, the event path without any redraw """
+    pos = squareCenter(app, "e4")
+    return [[mouse(pygame.MOUSEBUTTONDOWN if i % 2 == 0 else pygame.MOUSEBUTTONUP, pos)] for i in range(frames)]
+
+def fullFrames(app, frames, steps):
+    """ Every frame redraws the whole board, the pre dirty-rect cost """
+    return [[pygame.event.Event(pygame.USEREVENT)] for _ in range(frames)]
+
+scenarios = {
+    "drag": dragFrames,
+    "reset": resetFrames,
+    "click": clickFrames,
+    "full": fullFrames,
+}
+
+def percentiles(samples):
+    q = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    return {"mean": statistics.mean(samples) * 1e3, "p50": q[49] * 1e3, "p90": q[89] * 1e3, "p99": q[98] * 1e3}
+
+def runScenario(app, name, frames, steps):
+    script = scenarios[name](app, frames, steps)
+    app.chessSet = app.pieceFactory.getChessSet(app.fen)
+    app.board.setPieces(app.chessSet)
+    app.drawScreen()
+
+    eventTimes, renderTimes = [], []
+    start = time.perf_counter()
+    for events in script:
+        for evt in events:
+            pygame.event.post(evt)
+        if name == "full":
+            app.board.invalidateAll()
+        t0 = time.perf_counter()
+        app.processEvents()
+        t1 = time.perf_counter()
+        app.render()
+        renderTimes.append(time.perf_counter() - t1)
+        eventTimes.append(t1 - t0)
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "frames": len(script),
+        "events": sum(len(events) for events in script),
+        "fps": len(script) / elapsed,
+        "eventMs": percentiles(eventTimes),
+        "renderMs": percentiles(renderTimes),
+    }
+
+def printTable(results):
+    print("%-8s %7s %9s %10s %10s %10s %10s %10s" % ("scenario", "frames", "fps", "event p50", "event p99",
+                                                     "render p50", "render p90", "render p99"))
+    for r in results:
+        print("%-8s %7i %9.1f %10.3f %10.3f %10.3f %10.3f %10.3f" % (r["scenario"], r["frames"], r["fps"],
+              r["eventMs"]["p50"], r["eventMs"]["p99"], r["renderMs"]["p50"], r["renderMs"]["p90"],
+              r["renderMs"]["p99"]))
+    print("times in ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless pyChess rendering benchmark")
+    parser.add_argument("--frames", type=int, default=1000, help="frames per scenario")
+    parser.add_argument("--steps", type=int, default=20, help="motion frames per drag")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(scenarios), default=["drag", "click", "reset", "full"])
+    parser.add_argument("--img", help="piece image directory, placeholder discs if not given")
+    parser.add_argument("--output", "-o", help="write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        imageDir = args.img
+        if imageDir is None:
+            pygame.init()
+            placeholderAtlas(tmp)
+            imageDir = tmp
+        app = App(imageDir=imageDir)
+        app.init()
+        # processEvent prints every clicked square
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = [runScenario(app, name, args.frames, args.steps) for name in args.scenario]
+        pygame.quit()
+
+    printTable(results)
+    if args.output:
+        report = {
+            "args": vars(args),
+            "python": sys.version.split()[0],
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+startFen = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# squares are numbered a1 = 0, b1 = 1, ... h8 = 63
+squareNames = [f'{"abcdefgh"[i % 8]}{i // 8 + 1}' for i in range(64)]
+squareIndex = {name: i for i, name in enumerate(squareNames)}
+
+knightSteps = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+bishopDirs = ((1, 1), (1, -1), (-1, -1), (-1, 1))
+rookDirs = ((1, 0), (0, 1), (-1, 0), (0, -1))
+kingSteps = bishopDirs + rookDirs
+
+class BoardModel:
+    def __init__(self):
+        self.squares = [None] * 64
+
+    def __iter__(self):
+        return (p for p in self.squares if p is not None)
+
+    def get(self, square):
+        return self.squares[square]
+
+    def put(self, piece, square):
+        piece.square = square
+        self.squares[square] = piece
+
+    def remove(self, square):
+        piece = self.squares[square]
+        self.squares[square] = None
+        return piece
+
+    def move(self, src, dst):
+        """ Moves the piece on src to dst, returns the captured piece or None """
+        captured = self.squares[dst]
+        self.put(self.remove(src), dst)
+        return captured
+
+    def letterAt(self, file, rank):
+        """ FEN letter of the piece on file/rank (0-7), None if empty or off the board """
+        if 0 <= file < 8 and 0 <= rank < 8:
+            piece = self.squares[rank * 8 + file]
+            return piece.letter if piece is not None else None
+        return None
+
+    def isAttacked(self, square, white):
+        """ Is square attacked by the white (or black) pieces """
+        file, rank = square % 8, square // 8
+        own = str.upper if white else str.lower
+        pawnRank = rank - 1 if white else rank + 1
+        if own('P') in (self.letterAt(file - 1, pawnRank), self.letterAt(file + 1, pawnRank)):
+            return True
+        for steps, letter in ((knightSteps, own('N')), (kingSteps, own('K'))):
+            if any(self.letterAt(file + df, rank + dr) == letter for df, dr in steps):
+                return True
+        for dirs, attackers in ((rookDirs, own('RQ')), (bishopDirs, own('BQ'))):
+            for df, dr in dirs:
+                f, r = file + df, rank + dr
+                while 0 <= f < 8 and 0 <= r < 8:
+                    piece = self.squares[r * 8 + f]
+                    if piece is not None:
+                        if piece.letter in attackers:
+                            return True
+                        break
+                    f, r = f + df, r + dr
+        return False
+
+    def setFen(self, fen, makePiece):
+        """ Piece placement from a FEN string, makePiece(letter) creates the pieces """
+        self.squares = [None] * 64
+        for i, row in enumerate(fen.split()[0].split('/')):
+            square = (7 - i) * 8
+            for c in row:
+                if c.isdigit():
+                    square += int(c)
+                else:
+                    self.put(makePiece(c), square)
+                    square += 1
+
+    def placement(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = '', 0
+            for p in self.squares[rank * 8:rank * 8 + 8]:
+                if p is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += p.letter
+            rows.append(row + (str(empty) if empty else ''))
+        return '/'.join(rows)
@@ -1,49 +1,85 @@
 #!/usr/bin/python3
 import pygame
 from util import Colors
+from boardmodel import BoardModel, squareNames
 
 class Chessboard:
-    def __init__(self, x, y):
+    def __init__(self, x, y, square_size=80):
         self.position = (x, y)
-        self.square_size = 80
+        self.square_size = square_size
         self.board_size = 8 * self.square_size
         self.surface = pygame.Surface((self.board_size ,self.board_size))
-        self.pieces = []
+        self.background = self.renderBackground()
+        # top left corner of every square on self.surface
+        self.squareXY = [(i % 8 * self.square_size, (7 - i // 8) * self.square_size) for i in range(64)]
+        self.pieces = BoardModel()
         self.dragging = None
+        self.dragPos = None
+        self.dragOffset = (0, 0)
+        # called with (piece, src, dst) after a piece is dropped on another square
+        self.onMove = None
+        self.dirty = []
+        self.invalidateAll()
 
-    def drawBoard(self, screen):
-        color = None
-        for i in range(8):                        
-            for j in range(8):                        
+    def renderBackground(self):
+        surface = pygame.Surface((self.board_size, self.board_size))
+        for i in range(8):
+            for j in range(8):
                 color = Colors.Light.value if (i+j)%2==0 else Colors.Dark.value
-                pygame.draw.rect(self.surface, color, (i * self.square_size, j * self.square_size, self.square_size, self.square_size))
+                pygame.draw.rect(surface, color, (i * self.square_size, j * self.square_size, self.square_size, self.square_size))
+        return surface
+
+    def invalidate(self, rect):
+        """ rect in board coordinates """
+        self.dirty.append(pygame.Rect(rect))
+
+    def invalidateAll(self):
+        self.dirty = [self.surface.get_rect()]
+
+    def invalidateSquare(self, square):
+        self.invalidate(self.squareXY[square] + (self.square_size, self.square_size))
 
-        self.drawPieces()
-        self.drawSpecial()
-        screen.blit(self.surface, self.position)
+    def drawBoard(self, screen):
+        """ Redraws only what changed since the last call, returns the screen rects to update """
+        if not self.dirty:
+            return []
+        if len(self.dirty) > 8:
+            self.dirty = [self.dirty[0].unionall(self.dirty[1:])]
+        rects = []
+        for rect in self.dirty:
+            rect = rect.clip(self.surface.get_rect())
+            self.surface.set_clip(rect)
+            self.surface.blit(self.background, rect, rect)
+            self.drawPieces(rect)
+            self.drawSpecial()
+            self.surface.set_clip(None)
+            rects.append(screen.blit(self.surface, rect.move(self.position), rect))
+        self.dirty = []
+        return rects
 
     def setPieces(self, pieces):
         self.pieces = pieces
+        self.dragging = None
+        self.invalidateAll()
 
-    def drawPieces(self):
+    def pieceRect(self, p):
+        pos = self.dragPos if p is self.dragging else self.squareXY[p.square]
+        return pygame.Rect(pos, (self.square_size, self.square_size))
+
+    def drawPieces(self, clip):
         for p in self.pieces:
-            pos = self.squareNameToXY(p.pos)
-            p.draw(self.surface, pos)
+            if p is not self.dragging and clip.colliderect(self.pieceRect(p)):
+                p.draw(self.surface, self.squareXY[p.square], self.square_size)
+        if self.dragging is not None:
+            self.dragging.draw(self.surface, self.dragPos, self.square_size)
 
     def drawSpecial(self):
         #pygame.draw.rect(self.surface, color, (i * self.square_size, j * self.square_size, self.square_size, self.square_size))
         pass
 
-    def squareNameToXY(self, position):
-        col, row = position
-        col = ord(col) - ord('a')
-        row = 8 - int(row)
-        return (col * self.square_size, row * self.square_size)
-
-    def XYToSquareName(self, xy):
-        cols = 'abcdefgh'
+    def XYToSquare(self, xy):
         x,y = xy
-        return f'{cols[x]}{8-y}'
+        return (7 - y) * 8 + x
 
     def mousePositionToXY(self, pos):
         x,y = pos
@@ -53,26 +89,55 @@ class Chessboard:
         row = y//self.square_size
         return (col, row)
 
-    def mousePositionToSquareName(self, pos):
-        return self.XYToSquareName(self.mousePositionToXY(pos))
+    def mousePositionToSquare(self, pos):
+        return self.XYToSquare(self.mousePositionToXY(pos))
 
-    def findPieceOn(self, pos):
-        for p in self.pieces:
-            if p.pos == pos:
-                return p
-        return None
+    def isOnBoard(self, pos):
+        col, row = self.mousePositionToXY(pos)
+        return 0 <= col < 8 and 0 <= row < 8
+
+    def findPieceOn(self, square):
+        return self.pieces.get(square)
+
+    def moveDrag(self, mousePos):
+        self.invalidate(self.pieceRect(self.dragging))
+        self.dragPos = (mousePos[0] - self.position[0] - self.dragOffset[0],
+                        mousePos[1] - self.position[1] - self.dragOffset[1])
+        self.invalidate(self.pieceRect(self.dragging))
+
+    def endDrag(self):
+        self.invalidate(self.pieceRect(self.dragging))
+        self.dragging = None
+        self.dragPos = None
 
     def processEvent(self, event):
-        #check if pos in board
-        pos = self.mousePositionToSquareName(event.pos)
-        print(pos)
-        p = self.findPieceOn(pos)
+        if event.type == pygame.MOUSEMOTION:
+            if self.dragging is not None:
+                self.moveDrag(event.pos)
+            return
+
+        if not self.isOnBoard(event.pos):
+            if event.type == pygame.MOUSEBUTTONUP and self.dragging is not None:
+                self.invalidateSquare(self.dragging.square)
+                self.endDrag()
+            return
+
+        square = self.mousePositionToSquare(event.pos)
+        print(squareNames[square])
+        p = self.findPieceOn(square)
 
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             if p is not None:
                 self.dragging = p
+                x, y = self.squareXY[p.square]
+                self.dragOffset = (event.pos[0] - self.position[0] - x, event.pos[1] - self.position[1] - y)
+                self.dragPos = (x, y)
         elif event.type == pygame.MOUSEBUTTONUP and self.dragging is not None:
-            if p is not None and p != self.dragging: #dest square not empty and src pos != dst pos
-                self.pieces.remove(p)
-            self.dragging.pos = pos
-            self.dragging = None
\ No newline at end of file
+            self.invalidateSquare(self.dragging.square)
+            self.invalidateSquare(square)
+            moved, src = self.dragging, self.dragging.square
+            if square != src:
+                self.pieces.move(src, square)
+            self.endDrag()
+            if square != src and self.onMove is not None:
+                self.onMove(moved, src, square)
@@ -1,52 +1,155 @@
 #!/usr/bin/python3
+import argparse
 import pygame
 from util import Colors
 from chessboard import Chessboard
-from piece import PieceFactory, Piece
+from piece import PieceFactory, Piece, PieceColor, ImageLoader
+from boardmodel import startFen
+from analysis import AnalysisWorker, ANALYSIS
+
+# castling rights lost when a piece moves from or to these squares
+castlingSquares = {0: 'Q', 4: 'KQ', 7: 'K', 56: 'q', 60: 'kq', 63: 'k'}
 
 class App:
-    def __init__(self):
+    def __init__(self, fen=startFen, imageDir=None, engineCmd=None):
+        self.fen = fen
+        self.imageDir = imageDir
+        self.engineCmd = engineCmd
         self.screen = None
         self.width, self.height = 1500, 800
         self.p = None
         self.board = None
         self.pieceFactory = None
+        self.fps = 60
+        self.clock = None
+        self.turn = 'w'
+        self.castling = ''
+        self.analysis = None
+        self.font = None
+        self.panel = pygame.Rect(750, 50, 700, 90)
+        self.screenRects = []
 
     def init(self):
         pygame.init()
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("pyChess")
+        self.clock = pygame.time.Clock()
 
         self.board = Chessboard(x=50, y=50)
-        self.pieceFactory = PieceFactory()
-        self.chessSet = self.pieceFactory.getChessSet()
+        self.board.onMove = self.pieceMoved
+        self.pieceFactory = PieceFactory(ImageLoader(self.imageDir))
+        if self.engineCmd is not None:
+            self.font = pygame.font.Font(None, 30)
+            self.analysis = AnalysisWorker(self.engineCmd)
+        self.setupPosition()
+
+    def setupPosition(self):
+        self.chessSet = self.pieceFactory.getChessSet(self.fen)
         self.board.setPieces(self.chessSet)
+        fields = self.fen.split()
+        self.turn = fields[1] if len(fields) > 1 else 'w'
+        self.castling = fields[2].replace('-', '') if len(fields) > 2 else ''
+        self.startAnalysis()
+
+    def currentFen(self):
+        return f'{self.chessSet.placement()} {self.turn} {self.castling or "-"} - 0 1'
+
+    def pieceMoved(self, piece, src, dst):
+        self.turn = 'b' if piece.color == PieceColor.White else 'w'
+        for square in (src, dst):
+            for right in castlingSquares.get(square, ''):
+                self.castling = self.castling.replace(right, '')
+        self.startAnalysis()
+
+    def startAnalysis(self):
+        """ Restarts the engine on the current position, the board can be in any state while dragging pieces around """
+        if self.analysis is None:
+            return
+        if not self.isAnalysable():
+            self.analysis.stop()
+            self.drawAnalysis(None)
+            return
+        self.analysis.analyse(self.currentFen())
+        self.drawAnalysis(None)
+
+    def isAnalysable(self):
+        """ Engines may crash on missing kings, pawns on a back rank or the side not to move in check """
+        placement = self.chessSet.placement()
+        if placement.count('K') != 1 or placement.count('k') != 1:
+            return False
+        ranks = placement.split('/')
+        if any(c in 'Pp' for c in ranks[0] + ranks[7]):
+            return False
+        king = 'k' if self.turn == 'w' else 'K'
+        square = next(p.square for p in self.chessSet if p.letter == king)
+        return not self.chessSet.isAttacked(square, self.turn == 'w')
+
+    def drawAnalysis(self, info):
+        self.screen.fill(Colors.Black.value, self.panel)
+        if info is not None:
+            # engine scores are from the side to move
+            sign = 1 if self.turn == 'w' else -1
+            if info.mate is not None:
+                score = f'#{sign * info.mate}'
+            else:
+                score = f'{sign * info.score / 100:+.2f}'
+            lines = [f'depth {info.depth}  {score}', ' '.join(info.pv[:12])]
+            for i, text in enumerate(lines):
+                surface = self.font.render(text, True, Colors.Light.value)
+                self.screen.blit(surface, (self.panel.x, self.panel.y + i * 35))
+        self.screenRects.append(self.panel)
 
     def processEvents(self):
-        for evt in pygame.event.get():
+        events = pygame.event.get()
+        if not events:
+            # nothing to redraw, sleep until something happens
+            events = [pygame.event.wait()]
+        for evt in events:
             if evt.type == pygame.QUIT:
                 return False
-            elif evt.type in [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP]:
+            elif evt.type in [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION]:
                 self.board.processEvent(evt)
             elif evt.type == pygame.KEYUP and evt.key == pygame.K_r:
-                self.chessSet = self.pieceFactory.getChessSet()
-                self.board.setPieces(self.chessSet)
+                self.setupPosition()
+            elif evt.type == ANALYSIS and self.analysis is not None:
+                info = self.analysis.take()
+                if info is not None or self.analysis.dead:
+                    self.drawAnalysis(info)
         return True
 
+    def drawScreen(self):
+        self.screen.fill(Colors.Black.value)
+        self.board.invalidateAll()
+        self.board.drawBoard(self.screen)
+        pygame.display.flip()
+
+    def render(self):
+        rects = self.board.drawBoard(self.screen) + self.screenRects
+        self.screenRects = []
+        if rects:
+            pygame.display.update(rects)
+        return rects
+
     def main(self):
         self.init()
+        self.drawScreen()
 
         while True:
             if not self.processEvents():
                 break
 
-            self.screen.fill(Colors.Black.value)
-
-            self.board.drawBoard(self.screen)
+            self.render()
 
-            pygame.display.flip()
+            # caps redraws while dragging, motion events in between are coalesced
+            self.clock.tick(self.fps)
 
+        if self.analysis is not None:
+            self.analysis.close()
         pygame.quit()
 
 if __name__ == "__main__":
-    App().main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="pyChess")
+    parser.add_argument("fen", nargs="?", default=startFen)
+    parser.add_argument("--engine", help="UCI engine command, analyses the board while you move pieces")
+    args = parser.parse_args()
+    App(args.fen, engineCmd=args.engine).main()
@@ -1,6 +1,8 @@
 #!/usr/bin/python3
+import os
 import pygame
 from enum import Enum
+from boardmodel import BoardModel, startFen
 
 class PieceType(Enum):
     King = 1
@@ -14,8 +16,16 @@ class PieceColor(Enum):
     White = 1
     Black = 2
 
+imgDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'img')
+
 class ImageLoader:
-    def __init__(self):
+    """
+        Piece images cut from one atlas, img/pieces.png: a column per
+        PieceType (K Q R B N P), white row on top of the black one. The atlas
+        is read and converted to the display format on first use, scaled
+        images are cached per size, so boards of any size can share a loader.
+    """
+    def __init__(self, directory=None):
         self.typeMap = {
             'K': PieceType.King,
             'Q': PieceType.Queen,
@@ -28,57 +38,82 @@ class ImageLoader:
             'w': PieceColor.White,
             'b': PieceColor.Black,
         }
-        self.imageMap = { t: { c: None for c in PieceColor } for t in self.typeMap.values() }
+        self.directory = directory or imgDir
+        self.atlas = None
+        self.cell = 0
+        self.imageMap = {}
+
+    def loadAtlas(self):
+        path = os.path.join(self.directory, 'pieces.png')
+        if os.path.exists(path):
+            atlas = pygame.image.load(path)
+        else:
+            atlas = self.buildAtlas()
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        self.atlas = atlas
+        self.cell = atlas.get_width() // len(PieceType)
 
-    def loadImages(self):
-        for c in self.colorMap:
-            for t in self.typeMap:
-                img = pygame.image.load(f'img/{c}{t}.png')
-                self.imageMap[self.typeMap[t]][self.colorMap[c]] = img
+    def buildAtlas(self):
+        """ Atlas from the single images img/wK.png ... img/bP.png """
+        images = {(t, c): pygame.image.load(os.path.join(self.directory, f'{cl}{tl}.png'))
+                  for tl, t in self.typeMap.items() for cl, c in self.colorMap.items()}
+        cell = max(max(img.get_size()) for img in images.values())
+        atlas = pygame.Surface((cell * len(PieceType), cell * len(PieceColor)), pygame.SRCALPHA)
+        for (t, c), img in images.items():
+            atlas.blit(img, ((t.value - 1) * cell, (c.value - 1) * cell))
+        return atlas
 
-    def getImage(self, type, color):
-        return self.imageMap[type][color]
+    def getImage(self, type, color, size=None):
+        """ Image for a square of size x size pixels, the atlas cell size by default """
+        key = (type, color, size)
+        img = self.imageMap.get(key)
+        if img is None:
+            if self.atlas is None:
+                self.loadAtlas()
+            img = self.atlas.subsurface(((type.value - 1) * self.cell, (color.value - 1) * self.cell,
+                                         self.cell, self.cell))
+            if size is not None and size != self.cell:
+                img = pygame.transform.smoothscale(img, (size, size))
+            self.imageMap[key] = img
+        return img
 
 class Piece:
-    def __init__(self, type, color, position, image):
-        self.pos = position
+    def __init__(self, type, color, square, images):
+        self.square = square
         self.type = type
         self.color = color
-        self.image = image
+        self.images = images
+
+    @property
+    def letter(self):
+        """ FEN letter """
+        letter = 'KQRBNP'[self.type.value - 1]
+        return letter if self.color == PieceColor.White else letter.lower()
+
+    def getImage(self, size=None):
+        return self.images.getImage(self.type, self.color, size)
 
-    def draw(self, surface, pos):
-        surface.blit(self.image, pos)
+    def draw(self, surface, pos, size=None):
+        surface.blit(self.getImage(size), pos)
 
 class PieceFactory:
-    def __init__(self):
-        self.imageLoader = ImageLoader()
-        self.imageLoader.loadImages()
-
-    def getPiece(self, type, color, position=''):
-        return Piece(type, color, position, image=self.imageLoader.getImage(type, color))
-
-    def getChessSet(self):
-        chessSet = []
-        cols = 'abcdefgh'
-        pieces = [
-            PieceType.Rook, 
-            PieceType.Knight, 
-            PieceType.Bishop, 
-            PieceType.Queen, 
-            PieceType.King, 
-            PieceType.Bishop, 
-            PieceType.Knight, 
-            PieceType.Rook, 
-        ]
-        for c in PieceColor:
-            row = '2' if c == PieceColor.White else '7'
-            for p in range(8):
-                chessSet.append(self.getPiece(PieceType.Pawn, c, position=f'{cols[p]}{row}'))
-            
-            row = '1' if c == PieceColor.White else '8'
-            i = 0
-            for p in pieces:
-                chessSet.append(self.getPiece(p, c, position=f'{cols[i]}{row}'))
-                i += 1
+    def __init__(self, imageLoader=None):
+        self.imageLoader = imageLoader or ImageLoader()
 
+    def getPiece(self, type, color, square=None):
+        return Piece(type, color, square, images=self.imageLoader)
+
+    def getPieceFromLetter(self, letter):
+        color = PieceColor.White if letter.isupper() else PieceColor.Black
+        return self.getPiece(self.imageLoader.typeMap[letter.upper()], color)
+
+    def getChessSet(self, fen=startFen):
+        chessSet = BoardModel()
+        chessSet.setFen(fen, self.getPieceFromLetter)
         return chessSet
+
+if __name__ == "__main__":
+    # packs the single piece images into img/pieces.png
+    pygame.init()
+    pygame.image.save(ImageLoader().buildAtlas(), os.path.join(imgDir, 'pieces.png'))